@@ -0,0 +1,239 @@
+import glob
+import os
+import threading
+import time
+
+from tracker_store import unwrap_tracker_store
+
+# Status registry agent
+STATUS_IDLE = "idle"
+STATUS_LOADING = "loading"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+DEFAULT_MODEL_PATH = "./models"
+
+
+# Fungsi untuk mencari arsip model terbaru di folder model (seperti `rasa run`)
+def latest_model_file(model_path):
+    if os.path.isfile(model_path):
+        return model_path
+    archives = glob.glob(os.path.join(model_path, "*.tar.gz"))
+    if not archives:
+        return None
+    return max(archives, key=os.path.getmtime)
+
+
+# Fungsi untuk mendapatkan fingerprint model yang dipakai agent
+def agent_fingerprint(agent):
+    metadata = getattr(getattr(agent, 'processor', None), 'model_metadata', None)
+    return getattr(metadata, 'model_id', None) or getattr(agent, 'fingerprint', None)
+
+
+# Registry agent Rasa yang hidup selama proses server berjalan.
+# Streamlit menjalankan ulang skrip utama pada setiap interaksi, tetapi modul
+# yang diimpor tetap tersimpan di sys.modules, sehingga agent hanya dimuat sekali
+# dan dipakai bersama oleh semua sesi.
+# Model baru di folder model dimuat di latar belakang lalu ditukar secara atomik;
+# permintaan yang sedang berjalan tetap selesai dengan agent lama.
+class AgentRegistry:
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, tracker_store_factory=None):
+        self.model_path = model_path
+        self.tracker_store_factory = tracker_store_factory
+        self.load_hooks = []
+        self.status = STATUS_IDLE
+        self.error = None
+        self.model_file = None
+        self.fingerprint = None
+        self.load_duration = None
+        self.loaded_at = None
+        self.reloads = 0
+        self.reload_error = None
+        # Tracker store asli (tanpa pembungkus FailSafeTrackerStore dari Agent)
+        self.tracker_store = None
+        self._agent = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread = None
+        self._reloading = False
+        self._watcher = None
+        self._stop_watching = threading.Event()
+
+    @property
+    def is_ready(self):
+        return self.status == STATUS_READY
+
+    @property
+    def is_failed(self):
+        return self.status == STATUS_FAILED
+
+    # Fungsi untuk memuat model dan menjalankan semua hook sebelum agent dipakai
+    def _build_agent(self, model_file, tracker_store):
+        from rasa.core.agent import Agent
+        agent = Agent.load(model_file or self.model_path, tracker_store=tracker_store)
+        for hook in self.load_hooks:
+            hook(agent)
+        return agent
+
+    def _activate(self, agent, model_file, duration):
+        self._agent = agent
+        self.tracker_store = unwrap_tracker_store(agent.tracker_store)
+        self.model_file = model_file
+        self.fingerprint = agent_fingerprint(agent)
+        self.load_duration = duration
+        self.loaded_at = time.time()
+
+    # Fungsi untuk memuat agent secara sinkron (hanya sekali per proses)
+    def load(self):
+        with self._lock:
+            if self.status in (STATUS_READY, STATUS_FAILED):
+                return self._agent
+            self.status = STATUS_LOADING
+            self._done.clear()
+        started = time.perf_counter()
+        model_file = latest_model_file(self.model_path)
+        try:
+            tracker_store = self.tracker_store_factory() if self.tracker_store_factory else None
+            agent = self._build_agent(model_file, tracker_store)
+        except Exception as e:
+            print(f"Gagal memuat model Rasa dari {self.model_path}: {e}")
+            with self._lock:
+                self.status = STATUS_FAILED
+                self.error = e
+                self.model_file = model_file
+                self.load_duration = time.perf_counter() - started
+        else:
+            with self._lock:
+                self._activate(agent, model_file, time.perf_counter() - started)
+                self.status = STATUS_READY
+                self.error = None
+        finally:
+            self._done.set()
+        return self._agent
+
+    # Fungsi untuk memuat arsip model terbaru dan menukarnya tanpa downtime.
+    # Tracker store lama dipakai ulang sehingga percakapan yang berjalan tidak hilang.
+    def reload(self, force=False):
+        model_file = latest_model_file(self.model_path)
+        with self._lock:
+            if self.status != STATUS_READY or self._reloading:
+                return False
+            if model_file is None or (model_file == self.model_file and not force):
+                return False
+            self._reloading = True
+            # Store asli, bukan pembungkus FailSafeTrackerStore agent lama, agar
+            # pembungkus tidak bertumpuk pada setiap pemuatan ulang
+            tracker_store = self.tracker_store
+        started = time.perf_counter()
+        try:
+            agent = self._build_agent(model_file, tracker_store)
+        except Exception as e:
+            print(f"Gagal memuat ulang model Rasa dari {model_file}: {e}")
+            with self._lock:
+                self.reload_error = e
+                self._reloading = False
+            return False
+        with self._lock:
+            self._activate(agent, model_file, time.perf_counter() - started)
+            self.reloads += 1
+            self.reload_error = None
+            self._reloading = False
+        print(f"Model Rasa diperbarui ke {model_file} ({self.load_duration:.1f} detik)")
+        return True
+
+    # Fungsi untuk memeriksa folder model satu kali (dipanggil oleh watcher)
+    def check_for_new_model(self):
+        if self.status == STATUS_READY:
+            return self.reload()
+        if self.status == STATUS_FAILED:
+            # Coba lagi jika arsip model baru muncul setelah pemuatan pertama gagal
+            model_file = latest_model_file(self.model_path)
+            if model_file is not None and model_file != self.model_file:
+                self.reset()
+                return self.load() is not None
+        return False
+
+    # Fungsi untuk memantau folder model secara berkala di thread latar belakang
+    def start_watching(self, interval=30):
+        with self._lock:
+            if self._watcher is not None:
+                return
+            self._stop_watching.clear()
+            self._watcher = threading.Thread(target=self._watch, args=(interval,), name="rasa-model-watcher", daemon=True)
+            self._watcher.start()
+
+    def _watch(self, interval):
+        while not self._stop_watching.wait(interval):
+            try:
+                self.check_for_new_model()
+            except Exception as e:
+                print(f"Error saat memeriksa model baru: {e}")
+
+    def stop_watching(self):
+        self._stop_watching.set()
+        with self._lock:
+            self._watcher = None
+
+    # Fungsi untuk mendaftarkan hook yang dijalankan pada agent baru sebelum ditandai siap
+    def add_load_hook(self, hook):
+        if hook not in self.load_hooks:
+            self.load_hooks.append(hook)
+
+    # Fungsi untuk memulai pemuatan agent di thread latar belakang
+    def start(self):
+        with self._lock:
+            if self.status != STATUS_IDLE or self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self.load, name="rasa-agent-loader", daemon=True)
+            self._thread.start()
+
+    # Fungsi untuk mendapatkan agent; None jika gagal atau belum siap dalam batas waktu
+    def get_agent(self, timeout=None):
+        if self.status == STATUS_READY:
+            return self._agent
+        if self.status == STATUS_FAILED:
+            return None
+        self.start()
+        if not self._done.wait(timeout):
+            return None
+        return self._agent
+
+    # Fungsi untuk mengulang pemuatan setelah status gagal
+    def reset(self):
+        with self._lock:
+            if self.status == STATUS_LOADING:
+                return
+            self.status = STATUS_IDLE
+            self.error = None
+            self._agent = None
+            self._thread = None
+            self._done.clear()
+
+    # Fungsi untuk informasi pemantauan model yang aktif
+    def info(self):
+        return {
+            'status': self.status,
+            'model_file': self.model_file,
+            'fingerprint': self.fingerprint,
+            'load_duration': self.load_duration,
+            'loaded_at': self.loaded_at,
+            'reloads': self.reloads,
+            'reloading': self._reloading,
+            'warmup': getattr(self._agent, 'warmup_report', None),
+            'error': repr(self.error) if self.error else None,
+            'reload_error': repr(self.reload_error) if self.reload_error else None,
+        }
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+# Fungsi untuk mendapatkan registry bersama untuk sebuah path model
+def get_registry(model_path=DEFAULT_MODEL_PATH, tracker_store_factory=None):
+    with _registries_lock:
+        registry = _registries.get(model_path)
+        if registry is None:
+            registry = AgentRegistry(model_path, tracker_store_factory)
+            _registries[model_path] = registry
+        return registry
@@ -1,14 +1,12 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import seaborn as sns
 import uuid
 import os
 import json
-import asyncio
 import plotly.graph_objects as go
-from collections import Counter
 from datetime import datetime, timedelta
 try:
     from rasa.core.agent import Agent
@@ -19,145 +17,142 @@ except ImportError:
     print("Rasa tidak dapat diimpor. Menggunakan fallback.")
     RASA_AVAILABLE = False
 
-# Load Rasa agent
-model_path = "./models"  # Sesuaikan dengan path model Rasa Anda
-agent = Agent.load(model_path)
-
-# Fungsi untuk mendapatkan respons dari Rasa
-async def get_rasa_response(user_input):
-    try:
-        responses = await agent.handle_text(user_input)
-        if responses:
-            for response in responses:
-                if 'text' in response:
-                    return response['text']
-            return "Maaf, saya tidak mengerti. Bisakah Anda menjelaskan lebih lanjut?"
-        else:
-            return "Maaf, saya tidak dapat memproses permintaan Anda saat ini. Bisakah Anda coba lagi?"
-    except Exception as e:
-        print(f"Error in get_rasa_response: {e}")
-        return "Maaf, terjadi kesalahan. Bisakah Anda mencoba lagi?"
-
-# Fungsi untuk menjalankan coroutine dalam Streamlit
-def run_async(coroutine):
-    loop = asyncio.new_event_loop()
-    return loop.run_until_complete(coroutine)
-
-# Fungsi untuk menyimpan riwayat chat
+from rasa_client import get_rasa_reply, run_async, start_agent
+from metrics import chat_metrics, start_metrics_exporter
+from chat_store import CHAT_PAGE_SIZE, chat_store, new_message, start_retention_worker
+from chat_archive import delete_session, enforce_archive_retention, start_archive_exporter
+from chat_aggregates import USAGE_GRANULARITIES, attach_aggregates, usage_series
+from chat_export import EXPORT_FORMATS, discard_export, export_file, export_filename
+from chat_render import CHAT_RENDER_WINDOW, render_chat_html
+from chat_form import submission_form
+from figure_cache import figure_cache
+
+
+# Mulai memuat model Rasa di latar belakang (sekali per proses)
+if RASA_AVAILABLE:
+    start_agent()
+start_metrics_exporter()
+start_archive_exporter(chat_store)
+chat_aggregates = attach_aggregates(chat_store)
+start_retention_worker(chat_store, tasks=[enforce_archive_retention, chat_aggregates.enforce_retention])
+
+# Fungsi untuk menyimpan riwayat chat (hanya pesan yang belum tersimpan yang ditambahkan ke log)
 def save_chat_history(chat_history):
-    df = pd.DataFrame([(item['role'], item['message']) for item in chat_history], columns=['Role', 'Message'])
-    df.to_csv('chat_history.csv', index=False)
-
-# Fungsi untuk memuat riwayat chat
-def load_chat_history():
-    try:
-        df = pd.read_csv('chat_history.csv')
-        return [{'role': row['Role'], 'message': row['Message'], 'id': str(uuid.uuid4())} for _, row in df.iterrows()]
-    except FileNotFoundError:
-        return []
-
-# Fungsi untuk menganalisis sentimen (sederhana)
-def analyze_sentiment(text):
-    positive_words = set(['bahagia', 'senang', 'gembira', 'positif', 'baik'])
-    negative_words = set(['sedih', 'marah', 'kecewa', 'negatif', 'buruk'])
-    
-    words = set(text.lower().split())
-    
-    positive_score = len(words.intersection(positive_words))
-    negative_score = len(words.intersection(negative_words))
-    
-    if positive_score > negative_score:
-        return 'Positif'
-    elif negative_score > positive_score:
-        return 'Negatif'
+    with chat_metrics.timer("persist"):
+        new_items = []
+        for item in reversed(chat_history):
+            if item.get('saved'):
+                break
+            new_items.append(item)
+        new_items.reverse()
+        chat_store.append(new_items, st.session_state.get('sender_id'))
+        for item in new_items:
+            item['saved'] = True
+
+# Fungsi untuk memuat riwayat chat (hanya halaman pesan terbaru; halaman lama dimuat saat diminta)
+def load_chat_history(limit=CHAT_PAGE_SIZE):
+    items, cursor = chat_store.read_page(st.session_state.get('sender_id'), limit)
+    st.session_state.history_cursor = cursor
+    return [dict(item, saved=True) for item in items]
+
+# Fungsi untuk memuat satu halaman pesan yang lebih lama ke awal riwayat sesi
+def load_older_chat_history(limit=CHAT_PAGE_SIZE):
+    cursor = st.session_state.get('history_cursor')
+    if cursor is None:
+        return
+    items, cursor = chat_store.read_page(st.session_state.get('sender_id'), limit, before=cursor)
+    st.session_state.history_cursor = cursor
+    st.session_state.chat_history[:0] = [dict(item, saved=True) for item in items]
+
+# Fungsi untuk menampilkan grafik lewat cache figure. `data` adalah data yang dipakai
+# `build()`; figure hanya dibuat ulang jika data atau parameternya berubah.
+def show_figure(chart_id, data, build, use_container_width=False, **params):
+    kind, spec = figure_cache.get(chart_id, data, build, **params)
+    if kind == 'png':
+        # Seperti st.pyplot, gambar matplotlib selalu selebar kolom
+        st.image(spec, use_container_width=True)
     else:
-        return 'Netral'
+        st.plotly_chart(spec, use_container_width=use_container_width)
+
+# Fungsi untuk menyiapkan file unduhan riwayat sesi ini. File hanya ditulis ulang jika
+# pilihan ekspor atau riwayatnya berubah, bukan pada setiap rerun.
+def prepare_export(fmt, start, end, compress):
+    history = st.session_state.chat_history
+    key = (fmt, start, end, compress, len(history), history[-1]['id'] if history else None)
+    prepared = st.session_state.get('prepared_export')
+    if prepared is not None and prepared['key'] == key and os.path.exists(prepared['path']):
+        return prepared['path']
+    if prepared is not None:
+        discard_export(prepared['path'])
+    path = export_file(chat_store, fmt, st.session_state.sender_id, start, end, compress)
+    st.session_state.prepared_export = {'key': key, 'path': path}
+    return path
 
 # Fungsi untuk membuat grafik analisis sentimen
-def plot_sentiment_analysis(chat_history):
-    sentiments = [analyze_sentiment(item['message']) for item in chat_history if item['role'] == 'User']
-    sentiment_counts = pd.Series(sentiments).value_counts()
-    
-    plt.figure(figsize=(10, 6))
-    sns.barplot(x=sentiment_counts.index, y=sentiment_counts.values)
-    plt.title('Analisis Sentimen Percakapan')
-    plt.xlabel('Sentimen')
-    plt.ylabel('Jumlah')
-    st.pyplot(plt)
+def plot_sentiment_analysis(counts):
+    def build():
+        fig = Figure(figsize=(10, 6))
+        ax = fig.subplots()
+        sns.barplot(x=counts.index, y=counts.values, ax=ax)
+        ax.set_title('Analisis Sentimen Percakapan')
+        ax.set_xlabel('Sentimen')
+        ax.set_ylabel('Jumlah')
+        return fig
+    show_figure('sentiment_bar', counts.to_dict(), build)
 
 # Fungsi untuk mereset riwayat chat
 def reset_chat_history():
     st.session_state.chat_history = []
-    if os.path.exists('chat_history.csv'):
-        os.remove('chat_history.csv')
+    st.session_state.history_cursor = None
+    st.session_state.render_window = CHAT_RENDER_WINDOW
+    # Hanya riwayat sesi ini yang dihapus (log aktif, segmen lama dan arsip Parquet)
+    chat_store.reset(st.session_state.get('sender_id'))
+    delete_session(st.session_state.get('sender_id'))
+    st.session_state.show_export = False
+    discard_export((st.session_state.pop('prepared_export', None) or {}).get('path'))
+
+# Fungsi untuk mengirim satu pesan pengguna ke Rasa dan menyimpan balasannya
+def submit_user_message(user_input):
+    with chat_metrics.timer("turn"):
+        reply = run_async(get_rasa_reply(user_input, st.session_state.sender_id))
+        st.session_state.chat_history.append(new_message('User', user_input, intent=reply['intent'], confidence=reply['confidence']))
+        st.session_state.chat_history.append(new_message('Bot', reply['text']))
+        save_chat_history(st.session_state.chat_history)
 
 # Fungsi untuk mendapatkan perasaan pengguna
 def get_user_feeling():
-    user_feeling = st.text_input("Bagaimana perasaan Anda hari ini?", key="user_feeling_input")
-    if user_feeling:
-        response = run_async(get_rasa_response(user_feeling))
-        st.session_state.chat_history.append({'role': 'User', 'message': user_feeling, 'id': str(uuid.uuid4())})
-        st.session_state.chat_history.append({'role': 'Bot', 'message': response, 'id': str(uuid.uuid4())})
-        save_chat_history(st.session_state.chat_history)
+    user_feeling = submission_form("feeling", "Bagaimana perasaan Anda hari ini?")
+    if user_feeling is not None:
+        submit_user_message(user_feeling)
         st.session_state.conversation_stage = 'random_chat'
         st.experimental_rerun()
 
 # Fungsi untuk membuat diagram pie sentimen
-def plot_sentiment_pie_chart(chat_history):
-    sentiments = [analyze_sentiment(item['message']) for item in chat_history if item['role'] == 'User']
-    sentiment_counts = pd.Series(sentiments).value_counts()
-    
-    fig = go.Figure(data=[go.Pie(labels=sentiment_counts.index, values=sentiment_counts.values)])
-    fig.update_layout(title='Analisis Sentimen Percakapan')
-    st.plotly_chart(fig)
-
-def plot_usage_line_chart(chat_history):
-    if not chat_history:
-        st.write("Belum ada data penggunaan yang cukup untuk membuat grafik.")
-        return
-
-    dates = [datetime.strptime(item.get('timestamp', ''), "%Y-%m-%d %H:%M:%S").date() 
-             for item in chat_history 
-             if 'timestamp' in item and item['timestamp']]
-    
-    if not dates:
+def plot_sentiment_pie_chart(counts):
+    def build():
+        fig = go.Figure(data=[go.Pie(labels=counts.index, values=counts.values)])
+        fig.update_layout(title='Analisis Sentimen Percakapan')
+        return fig
+    show_figure('sentiment_pie', counts.to_dict(), build)
+
+# Fungsi untuk membuat grafik tren penggunaan dari jumlah pesan per jam ({"YYYY-MM-DD HH:00": n})
+def plot_usage_line_chart(usage, granularity='day'):
+    if not usage:
         st.write("Tidak ada data timestamp yang valid untuk membuat grafik penggunaan.")
         return
 
-    date_counts = Counter(dates)
-    
-    all_dates = pd.date_range(min(dates), max(dates))
-    for date in all_dates:
-        if date.date() not in date_counts:
-            date_counts[date.date()] = 0
-
-    df = pd.DataFrame(list(date_counts.items()), columns=['Date', 'Count'])
-    df = df.sort_values('Date')
-    
-    fig = px.line(df, x='Date', y='Count', title='Tren Penggunaan Chatbot')
-    st.plotly_chart(fig)
+    def build():
+        series = usage_series(usage, granularity)
+        df = pd.DataFrame({'Date': series.index, 'Count': series.values})
+        return px.line(df, x='Date', y='Count', title='Tren Penggunaan Chatbot')
+    show_figure('usage_line', usage, build, granularity=granularity)
 
 # Fungsi untuk membuat diagram batang topik
-def plot_topic_bar_chart(chat_history):
-    def extract_topic(message):
-        topics = {
-            'Kecemasan': ['cemas', 'khawatir', 'takut'],
-            'Depresi': ['sedih', 'depresi', 'putus asa'],
-            'Stres': ['stres', 'tertekan', 'overwhelmed'],
-            'Tidur': ['tidur', 'insomnia', 'lelah'],
-            'Relasi': ['hubungan', 'teman', 'keluarga']
-        }
-        for topic, keywords in topics.items():
-            if any(keyword in message.lower() for keyword in keywords):
-                return topic
-        return 'Lainnya'
-
-    topics = [extract_topic(item['message']) for item in chat_history if item['role'] == 'User']
-    topic_counts = Counter(topics)
-    
-    df = pd.DataFrame(list(topic_counts.items()), columns=['Topic', 'Count'])
-    fig = px.bar(df, x='Topic', y='Count', title='Frekuensi Topik Percakapan')
-    st.plotly_chart(fig)
+def plot_topic_bar_chart(topic_counts):
+    def build():
+        df = pd.DataFrame(list(topic_counts.items()), columns=['Topic', 'Count'])
+        return px.bar(df, x='Topic', y='Count', title='Frekuensi Topik Percakapan')
+    show_figure('topic_bar', topic_counts, build)
 
 # Fungsi untuk menyimpan hasil tes
 def save_test_result(result):
@@ -337,26 +332,27 @@ def comprehensive_mental_health_test():
         st.write(result)
 
         # Visualisasi hasil
-        fig = go.Figure(go.Indicator(
-            mode = "gauge+number",
-            value = percentage,
-            domain = {'x': [0, 1], 'y': [0, 1]},
-            title = {'text': "Tingkat Stres/Kecemasan"},
-            gauge = {
-                'axis': {'range': [None, 100]},
-                'bar': {'color': "darkblue"},
-                'steps' : [
-                    {'range': [0, 20], 'color': "cyan"},
-                    {'range': [20, 40], 'color': "royalblue"},
-                    {'range': [40, 60], 'color': "lightgreen"},
-                    {'range': [60, 80], 'color': "yellow"},
-                    {'range': [80, 100], 'color': "red"}],
-                'threshold': {
-                    'line': {'color': "red", 'width': 4},
-                    'thickness': 0.75,
-                    'value': percentage}}))
-
-        st.plotly_chart(fig)
+        def build_gauge():
+            return go.Figure(go.Indicator(
+                mode = "gauge+number",
+                value = percentage,
+                domain = {'x': [0, 1], 'y': [0, 1]},
+                title = {'text': "Tingkat Stres/Kecemasan"},
+                gauge = {
+                    'axis': {'range': [None, 100]},
+                    'bar': {'color': "darkblue"},
+                    'steps' : [
+                        {'range': [0, 20], 'color': "cyan"},
+                        {'range': [20, 40], 'color': "royalblue"},
+                        {'range': [40, 60], 'color': "lightgreen"},
+                        {'range': [60, 80], 'color': "yellow"},
+                        {'range': [80, 100], 'color': "red"}],
+                    'threshold': {
+                        'line': {'color': "red", 'width': 4},
+                        'thickness': 0.75,
+                        'value': percentage}}))
+
+        show_figure('test_gauge', percentage, build_gauge)
 
         # Analisis per kategori
         categories = {
@@ -380,9 +376,10 @@ def comprehensive_mental_health_test():
             category_score = sum([scores[i] for i in question_indices]) / len(question_indices)
             category_scores[category] = (category_score / 4) * 100  # Normalisasi ke persentase
 
-        category_df = pd.DataFrame(list(category_scores.items()), columns=['Kategori', 'Skor'])
-        fig = px.bar(category_df, x='Kategori', y='Skor', title='Skor per Kategori')
-        st.plotly_chart(fig)
+        def build_categories():
+            category_df = pd.DataFrame(list(category_scores.items()), columns=['Kategori', 'Skor'])
+            return px.bar(category_df, x='Kategori', y='Skor', title='Skor per Kategori')
+        show_figure('test_categories', category_scores, build_categories)
 
         # Fungsi untuk menghasilkan laporan yang dapat diunduh
         def generate_report():
@@ -418,9 +415,11 @@ def dashboard():
         'Kategori': ['Stres', 'Depresi', 'Kecemasan', 'Burnout'],
         'Jumlah': [120, 80, 150, 60]
     }
-    df = pd.DataFrame(data)
-    fig = px.bar(df, x='Kategori', y='Jumlah', title='Distribusi Kesehatan Mental')
-    st.plotly_chart(fig, use_container_width=True)
+    show_figure(
+        'dashboard_distribution', data,
+        lambda: px.bar(pd.DataFrame(data), x='Kategori', y='Jumlah', title='Distribusi Kesehatan Mental'),
+        use_container_width=True,
+    )
 
 # Fungsi tes mental (dari kode sebelumnya)
 def tes_mental():
@@ -465,6 +464,13 @@ def chatbot():
     """, unsafe_allow_html=True)
 
     # Initialize session state variables
+    # ID sesi acak yang hanya disimpan di session state (tidak pernah di URL), sehingga
+    # riwayat tidak bisa dibuka atau direset lewat tautan yang dibagikan
+    if 'sender_id' not in st.session_state:
+        st.session_state.sender_id = str(uuid.uuid4())
+    if 'sid' in st.query_params:
+        # Tautan lama yang masih membawa ?sid= dibersihkan dan tidak dipakai
+        del st.query_params['sid']
     if 'chat_history' not in st.session_state:
         st.session_state.chat_history = load_chat_history()
     if 'user_name' not in st.session_state:
@@ -473,14 +479,18 @@ def chatbot():
         st.session_state.conversation_stage = 'ask_name'
 
     # Display chat history
+    # Hanya jendela pesan terbaru yang dirender; potongan HTML per pesan diambil dari cache
+    if 'render_window' not in st.session_state:
+        st.session_state.render_window = CHAT_RENDER_WINDOW
+    has_older = len(st.session_state.chat_history) > st.session_state.render_window
+    if has_older or st.session_state.get('history_cursor') is not None:
+        if st.button("Muat pesan sebelumnya"):
+            st.session_state.render_window += CHAT_RENDER_WINDOW
+            if len(st.session_state.chat_history) < st.session_state.render_window:
+                load_older_chat_history()
+            st.experimental_rerun()
     if st.session_state.chat_history:
-        chat_html = '<div class="chat-container">'
-        for item in st.session_state.chat_history:
-            if item['role'] == "User":
-                chat_html += f'<div class="user-message"><strong>Anda : </strong> {item["message"]}</div>'
-            else:
-                chat_html += f'<div class="bot-message"><strong>SedulurRasa : </strong> {item["message"]}</div>'
-        chat_html += '</div>'
+        chat_html = render_chat_html(st.session_state.chat_history, st.session_state.render_window)
         st.markdown(chat_html, unsafe_allow_html=True)
         st.markdown("<hr>", unsafe_allow_html=True)
 
@@ -490,7 +500,7 @@ def chatbot():
         if name_input:
             st.session_state.user_name = name_input
             greeting_message = f"Halo, {st.session_state.user_name}! Salam kenal, aku Sedulurmu, siap mendengarkan."
-            st.session_state.chat_history.append({'role': 'Bot', 'message': greeting_message, 'id': str(uuid.uuid4())})
+            st.session_state.chat_history.append(new_message('Bot', greeting_message))
             save_chat_history(st.session_state.chat_history)
             st.session_state.conversation_stage = 'ask_feeling'
             st.experimental_rerun()
@@ -499,13 +509,9 @@ def chatbot():
         get_user_feeling()
 
     elif st.session_state.conversation_stage == 'random_chat':
-        user_input = st.text_input("", key="user_input")
-        
-        if user_input:
-            response = run_async(get_rasa_response(user_input))
-            st.session_state.chat_history.append({'role': 'User', 'message': user_input, 'id': str(uuid.uuid4())})
-            st.session_state.chat_history.append({'role': 'Bot', 'message': response, 'id': str(uuid.uuid4())})
-            save_chat_history(st.session_state.chat_history)
+        user_input = submission_form("chat")
+        if user_input is not None:
+            submit_user_message(user_input)
             st.experimental_rerun()
 
         col1, col2 = st.columns([1.5, 0.5])
@@ -520,23 +526,46 @@ def chatbot():
 
         with col2:
             if st.button("Unduh Riwayat Chat"):
-                df = pd.DataFrame([(item['role'], item['message']) for item in st.session_state.chat_history], columns=['Role', 'Message'])
-                csv = df.to_csv(index=False)
-                st.download_button(
-                    label="Unduh sebagai CSV",
-                    data=csv,
-                    file_name="chat_history.csv",
-                    mime="text/csv"
-                )
+                st.session_state.show_export = True
+            if st.session_state.get('show_export'):
+                export_format = st.selectbox("Format", list(EXPORT_FORMATS), key="export_format")
+                export_dates = st.date_input("Rentang tanggal (opsional)", value=(), key="export_dates")
+                compress = st.checkbox("Kompres (gzip)", key="export_gzip")
+                start, end = (export_dates[0].isoformat(), export_dates[-1].isoformat()) if export_dates else (None, None)
+                file_name, mime = export_filename(export_format, compress)
+                path = prepare_export(export_format, start, end, compress)
+                with open(path, 'rb') as f:
+                    downloaded = st.download_button(
+                        label=f"Unduh sebagai {export_format.upper()}",
+                        data=f,
+                        file_name=file_name,
+                        mime=mime
+                    )
+                if downloaded:
+                    st.session_state.show_export = False
+                    discard_export(st.session_state.pop('prepared_export')['path'])
         
         st.markdown("<hr>", unsafe_allow_html=True)
 
+        usage_granularity = st.selectbox(
+            "Granularitas tren penggunaan",
+            list(USAGE_GRANULARITIES),
+            index=1,
+            format_func={'hour': 'Per jam', 'day': 'Per hari', 'week': 'Per minggu'}.get,
+            key="usage_granularity",
+        )
+        usage_all_sessions = st.checkbox("Tren penggunaan semua sesi", key="usage_all_sessions")
+
         # Tombol untuk menganalisis sentimen
         if st.button("Analisis Sentimen"):
-            plot_sentiment_analysis(st.session_state.chat_history)
-            plot_sentiment_pie_chart(st.session_state.chat_history)
-            plot_usage_line_chart(st.session_state.chat_history)
-            plot_topic_bar_chart(st.session_state.chat_history)
+            # Semua grafik dibuat dari ringkasan yang diperbarui saat pesan disimpan
+            summary = chat_aggregates.summary(st.session_state.sender_id)
+            counts = pd.Series(summary['sentiment'], dtype='int64')
+            plot_sentiment_analysis(counts)
+            plot_sentiment_pie_chart(counts)
+            usage = chat_aggregates.summary()['usage'] if usage_all_sessions else summary['usage']
+            plot_usage_line_chart(usage, usage_granularity)
+            plot_topic_bar_chart(summary['topics'])
 
     st.markdown("---")
     st.write("Catatan: Chatbot ini hanya memberikan informasi umum dan bukan pengganti konsultasi dengan profesional kesehatan mental. Jika Anda memiliki masalah kesehatan mental yang serius, silakan hubungi profesional kesehatan atau layanan darurat.")
@@ -0,0 +1,80 @@
+import asyncio
+import concurrent.futures
+import threading
+
+
+# Event loop tunggal yang berjalan terus di thread tersendiri.
+# Semua coroutine Rasa dijalankan di loop ini sehingga tidak ada loop baru per
+# pesan, dan state yang disimpan agent pada loop (koneksi, task) tetap terjaga.
+class BackgroundLoop:
+    def __init__(self, name="rasa-event-loop"):
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._started = threading.Event()
+
+    @property
+    def loop(self):
+        self.start()
+        return self._loop
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._started.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            pending = asyncio.all_tasks(self._loop)
+            for task in pending:
+                task.cancel()
+            if pending:
+                self._loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+            self._loop.close()
+
+    # Fungsi untuk menyalakan loop (aman dipanggil berkali-kali dari thread mana pun)
+    def start(self):
+        with self._lock:
+            if self.is_running:
+                return
+            self._started.clear()
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        self._started.wait()
+
+    # Fungsi untuk mengirim coroutine ke loop; mengembalikan concurrent.futures.Future
+    def submit(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    # Fungsi untuk menjalankan coroutine dan menunggu hasilnya dengan batas waktu
+    def run(self, coroutine, timeout=None):
+        future = self.submit(coroutine)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    # Fungsi untuk menghentikan loop dan menunggu thread selesai
+    def stop(self, timeout=None):
+        with self._lock:
+            if not self.is_running:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            thread = self._thread
+            self._thread = None
+        thread.join(timeout)
+
+
+_default_loop = BackgroundLoop()
+
+
+# Fungsi untuk mendapatkan loop latar belakang bersama
+def get_background_loop():
+    return _default_loop
@@ -0,0 +1,295 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import pandas as pd
+
+from chat_archive import ARCHIVE_PATH, iter_analytics_messages
+from chat_store import CHAT_RETENTION_DAYS, TIMESTAMP_FORMAT
+from sentiment import SENTIMENT_LABELS, classify, score_messages
+from topics import load_topic_matcher
+
+CHAT_AGGREGATES_PATH = 'chat_aggregates'  # direktori ringkasan, satu file JSON per sesi
+AGGREGATES_COLUMNS = ['session_id', 'role', 'message', 'timestamp']  # kolom arsip yang dibaca saat membangun ulang
+AGGREGATES_SAVE_INTERVAL = 5.0  # detik antar penyimpanan ringkasan yang berubah oleh thread penyimpan
+USAGE_BUCKET_FORMAT = "{}:00"  # kunci bucket penggunaan per jam: "YYYY-MM-DD HH:00"
+# Granularitas grafik penggunaan: offset resample pandas (minggu dimulai hari Senin)
+USAGE_GRANULARITIES = {'hour': pd.offsets.Hour(), 'day': pd.offsets.Day(), 'week': pd.offsets.Week(weekday=0)}
+# Zona waktu tampilan grafik (mis. "Asia/Jakarta"); kosong = waktu lokal server apa adanya
+USAGE_TIMEZONE = os.environ.get("SEDULURRASA_TIMEZONE") or None
+# Zona waktu bernama tempat timestamp disimpan; kosong = diambil dari TZ atau /etc/localtime
+SERVER_TIMEZONE = os.environ.get("SEDULURRASA_SERVER_TIMEZONE") or None
+
+
+# Fungsi untuk mendapatkan nama zona waktu lokal server (mis. "Asia/Jakarta").
+# Zona bernama diperlukan agar tiap timestamp memakai offset yang berlaku saat itu,
+# bukan offset saat ini yang salah untuk data di seberang pergantian DST.
+def server_timezone():
+    candidates = [SERVER_TIMEZONE, (os.environ.get("TZ") or '').lstrip(':')]
+    try:
+        localtime = os.path.realpath('/etc/localtime')
+        if '/zoneinfo/' in localtime:
+            candidates.append(localtime.split('/zoneinfo/', 1)[1])
+    except OSError:
+        pass
+    for name in candidates:
+        if not name:
+            continue
+        try:
+            ZoneInfo(name)
+            return name
+        except (ZoneInfoNotFoundError, ValueError):
+            continue
+    return None
+
+
+def _usage_bucket(timestamp):
+    return USAGE_BUCKET_FORMAT.format(timestamp[:13]) if timestamp and len(timestamp) >= 13 else None
+
+
+# Fungsi untuk mengubah bucket penggunaan per jam menjadi deret waktu berisi jumlah
+# pesan per jam/hari/minggu, termasuk periode kosong (nilai 0). Timestamp tersimpan
+# dalam waktu lokal server (zona `server_tz`) dan dikonversi ke zona `tz` jika diberikan.
+def usage_series(usage, granularity='day', tz=USAGE_TIMEZONE, server_tz=None):
+    if granularity not in USAGE_GRANULARITIES:
+        raise ValueError(f"Granularitas penggunaan tidak dikenal: {granularity}")
+    if not usage:
+        return pd.Series(dtype='int64')
+    index = pd.to_datetime(pd.Index(list(usage.keys())), format="%Y-%m-%d %H:%M", errors='coerce')
+    counts = pd.Series(list(usage.values()), index=index, dtype='int64')
+    counts = counts[counts.index.notna()]
+    if tz:
+        server_tz = server_tz or server_timezone()
+        if server_tz is None:
+            print("Zona waktu server tidak diketahui; grafik penggunaan memakai waktu lokal server")
+        else:
+            # Jam yang berulang saat DST berakhir sudah tergabung dalam satu bucket dan
+            # dihitung sebagai kemunculan pertama; jam yang terlewati digeser ke depan
+            counts.index = counts.index.tz_localize(server_tz, ambiguous=True, nonexistent='shift_forward').tz_convert(tz)
+    return counts.resample(USAGE_GRANULARITIES[granularity], label='left', closed='left').sum()
+
+
+def _empty_summary():
+    return {'sentiment': Counter(), 'topics': Counter(), 'usage': Counter(), 'messages': 0}
+
+
+def _summary_from_json(data):
+    return {
+        'sentiment': Counter(data.get('sentiment') or {}),
+        'topics': Counter(data.get('topics') or {}),
+        'usage': Counter(data.get('usage') or {}),
+        'messages': data.get('messages', 0),
+    }
+
+
+def _summary_to_json(session_id, summary):
+    return {'session_id': session_id, **{key: dict(value) if isinstance(value, Counter) else value for key, value in summary.items()}}
+
+
+# Ringkasan analitik per sesi yang diperbarui setiap kali pesan ditulis ke
+# penyimpanan chat (dipasang sebagai listener penyimpanan, jadi berjalan di thread
+# penulis, bukan di jalur balasan). Grafik dibuat dari ringkasan berukuran tetap:
+# jumlah per sentimen, per topik dan per jam pemakaian.
+#
+# Setiap sesi disimpan di filenya sendiri di direktori CHAT_AGGREGATES_PATH, dan
+# thread penyimpan hanya menulis ulang sesi yang berubah sejak penyimpanan terakhir,
+# jadi thread penulis tidak pernah menunggu serialisasi ringkasan.
+class ConversationAggregates:
+    def __init__(self, path=CHAT_AGGREGATES_PATH, save_interval=AGGREGATES_SAVE_INTERVAL):
+        self.path = path
+        self.save_interval = save_interval
+        self._sessions = {}
+        self._lock = threading.Lock()
+        # Menjaga urutan penulisan file antara thread penyimpan, atexit dan reset
+        self._save_lock = threading.Lock()
+        self._dirty = set()
+        self._saver_started = False
+        self._loaded = self._load()
+        atexit.register(self.save)
+
+    def _session_path(self, session_id):
+        return os.path.join(self.path, f"{hashlib.sha1(session_id.encode('utf-8')).hexdigest()}.json")
+
+    def _load(self):
+        if not os.path.isdir(self.path):
+            return False
+        for name in os.listdir(self.path):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.path, name), encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Gagal membaca ringkasan analitik {name}: {e}")
+                continue
+            self._sessions[data['session_id']] = _summary_from_json(data)
+        return True
+
+    @property
+    def is_loaded(self):
+        return self._loaded
+
+    # Fungsi untuk memperbarui ringkasan dari pesan baru [(session_id, [item, ...]), ...].
+    # Sentimen dan topik semua pesan pengguna dalam satu batch dihitung sekaligus.
+    def add(self, groups):
+        updates = []
+        for session_id, items in groups:
+            user_messages = [item['message'] for item in items if item.get('role') == 'User']
+            sentiment = classify(score_messages(user_messages)).value_counts() if user_messages else {}
+            topics = load_topic_matcher().counts(user_messages)
+            usage = Counter(filter(None, (_usage_bucket(item.get('timestamp')) for item in items)))
+            updates.append((session_id or 'default', sentiment, topics, usage, len(items)))
+        with self._lock:
+            for session_id, sentiment, topics, usage, count in updates:
+                summary = self._sessions.setdefault(session_id, _empty_summary())
+                summary['sentiment'].update({label: int(n) for label, n in dict(sentiment).items()})
+                summary['topics'].update(topics)
+                summary['usage'].update(usage)
+                summary['messages'] += count
+                self._dirty.add(session_id)
+
+    # Listener penyimpanan chat
+    def on_append(self, groups):
+        self.add(groups)
+
+    def on_close(self):
+        self.save()
+
+    # Ringkasan sesi yang dihapus langsung dihapus juga dari disk
+    def on_reset(self, session_id=None):
+        with self._lock:
+            if session_id is None:
+                self._dirty.update(self._sessions)
+                self._sessions.clear()
+            else:
+                self._sessions.pop(session_id, None)
+                self._dirty.add(session_id)
+        self.save()
+
+    # Fungsi retensi (dijalankan worker retensi): membuang bucket penggunaan yang lebih tua
+    # dari CHAT_RETENTION_DAYS dan seluruh ringkasan sesi yang pemakaian terakhirnya
+    # sudah kedaluwarsa, sehingga jumlah sesi tidak tumbuh tanpa batas
+    def enforce_retention(self, retention_days=CHAT_RETENTION_DAYS, now=None):
+        if not retention_days:
+            return {'removed': 0}
+        cutoff = _usage_bucket(((now or datetime.now()) - timedelta(days=retention_days)).strftime(TIMESTAMP_FORMAT))
+        removed = 0
+        with self._lock:
+            for session_id, summary in list(self._sessions.items()):
+                expired = [bucket for bucket in summary['usage'] if bucket < cutoff]
+                if not expired:
+                    continue
+                for bucket in expired:
+                    del summary['usage'][bucket]
+                if not summary['usage']:
+                    del self._sessions[session_id]
+                    removed += 1
+                self._dirty.add(session_id)
+        return {'removed': removed}
+
+    # Fungsi untuk mendapatkan salinan ringkasan satu sesi (atau semua sesi jika session_id kosong)
+    def summary(self, session_id=None):
+        with self._lock:
+            if session_id is not None:
+                summaries = [self._sessions.get(session_id, _empty_summary())]
+            else:
+                summaries = list(self._sessions.values()) or [_empty_summary()]
+            result = _empty_summary()
+            for summary in summaries:
+                result['sentiment'].update(summary['sentiment'])
+                result['topics'].update(summary['topics'])
+                result['usage'].update(summary['usage'])
+                result['messages'] += summary['messages']
+        result['sentiment'] = Counter({label: result['sentiment'][label] for label in SENTIMENT_LABELS if result['sentiment'][label]})
+        return result
+
+    # Fungsi untuk membangun ulang semua ringkasan dari riwayat yang sudah ada (dipakai
+    # sekali saat direktori ringkasan belum ada): hari yang sudah diarsipkan dibaca dari
+    # arsip Parquet dengan proyeksi kolom, sisanya dari penyimpanan chat
+    def rebuild(self, store, archive_path=ARCHIVE_PATH):
+        with self._lock:
+            self._sessions.clear()
+        for chunk in iter_analytics_messages(store, AGGREGATES_COLUMNS, archive_path):
+            groups = {}
+            for item in chunk:
+                groups.setdefault(item.get('session_id') or 'default', []).append(item)
+            self.add(list(groups.items()))
+        os.makedirs(self.path, exist_ok=True)
+        self._loaded = True
+        self.save()
+
+    # Fungsi untuk menulis ringkasan sesi yang berubah (dan menghapus file sesi yang sudah dihapus)
+    def save(self):
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                dirty, self._dirty = self._dirty, set()
+                data = {
+                    session_id: _summary_to_json(session_id, self._sessions[session_id]) if session_id in self._sessions else None
+                    for session_id in dirty
+                }
+            try:
+                os.makedirs(self.path, exist_ok=True)
+            except OSError as e:
+                print(f"Gagal menyimpan ringkasan analitik ke {self.path}: {e}")
+                with self._lock:
+                    self._dirty.update(dirty)
+                return
+            for session_id, summary in data.items():
+                path = self._session_path(session_id)
+                try:
+                    if summary is None:
+                        if os.path.exists(path):
+                            os.remove(path)
+                        continue
+                    tmp_path = f"{path}.tmp"
+                    with open(tmp_path, 'w', encoding='utf-8') as f:
+                        json.dump(summary, f, ensure_ascii=False)
+                    os.replace(tmp_path, path)
+                except OSError as e:
+                    print(f"Gagal menyimpan ringkasan analitik ke {path}: {e}")
+                    with self._lock:
+                        self._dirty.add(session_id)
+
+    def _save_periodically(self):
+        while True:
+            time.sleep(self.save_interval)
+            try:
+                self.save()
+            except Exception as e:
+                print(f"Gagal menyimpan ringkasan analitik ke {self.path}: {e}")
+
+    # Fungsi untuk menyalakan thread penyimpan ringkasan sekali per objek
+    def start_saver(self):
+        with self._lock:
+            if self._saver_started:
+                return
+            self._saver_started = True
+        threading.Thread(target=self._save_periodically, name="chat-aggregates-saver", daemon=True).start()
+
+
+_aggregates = {}
+_aggregates_lock = threading.Lock()
+
+
+# Fungsi untuk mendapatkan ringkasan bersama dan memasangnya sebagai listener
+# penyimpanan chat (sekali per proses). Jika direktori ringkasan belum ada, ringkasan
+# dibangun dari riwayat yang sudah tersimpan.
+def attach_aggregates(store, path=CHAT_AGGREGATES_PATH):
+    with _aggregates_lock:
+        aggregates = _aggregates.get(path)
+        if aggregates is None:
+            aggregates = ConversationAggregates(path)
+            if not aggregates.is_loaded:
+                aggregates.rebuild(store)
+            store.add_listener(aggregates)
+            aggregates.start_saver()
+            _aggregates[path] = aggregates
+        return aggregates
@@ -0,0 +1,215 @@
+import os
+import shutil
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from chat_store import CHAT_RETENTION_DAYS
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    print("pyarrow tidak dapat diimpor. Arsip Parquet chat dinonaktifkan.")
+    PYARROW_AVAILABLE = False
+
+# Arsip kolumnar untuk analitik: satu file Parquet per hari yang sudah ditutup,
+# dipartisi gaya Hive (chat_archive/date=YYYY-MM-DD/part-0.parquet).
+# Hari berjalan tetap dibaca dari penyimpanan chat.
+ARCHIVE_PATH = 'chat_archive'
+ARCHIVE_EXPORT_INTERVAL = 3600  # detik antar ekspor hari yang sudah ditutup
+ARCHIVE_COLUMNS = ['id', 'session_id', 'role', 'message', 'timestamp', 'intent', 'confidence', 'template']
+_PART_FILE = 'part-0.parquet'
+
+
+def _schema():
+    return pa.schema([
+        ('id', pa.string()),
+        ('session_id', pa.string()),
+        ('role', pa.string()),
+        ('message', pa.string()),
+        ('timestamp', pa.string()),
+        ('intent', pa.string()),
+        ('confidence', pa.float64()),
+        ('template', pa.string()),
+    ])
+
+
+def _day(item):
+    timestamp = item.get('timestamp')
+    return timestamp[:10] if timestamp else None
+
+
+def _to_record(item):
+    confidence = item.get('confidence')
+    return {
+        'id': item.get('id') or None,
+        'session_id': item.get('session_id') or None,
+        'role': item.get('role'),
+        'message': item.get('message'),
+        'timestamp': item.get('timestamp'),
+        'intent': item.get('intent') or None,
+        'confidence': float(confidence) if confidence not in (None, '') else None,
+        'template': item.get('template') or None,
+    }
+
+
+# Fungsi untuk mendapatkan daftar hari yang sudah ada di arsip
+def archived_days(path=ARCHIVE_PATH):
+    if not os.path.isdir(path):
+        return set()
+    return {
+        name[5:] for name in os.listdir(path)
+        if name.startswith('date=') and os.path.exists(os.path.join(path, name, _PART_FILE))
+    }
+
+
+# Fungsi untuk mendapatkan awal hari setelah `day` (detik epoch), atau None jika `day` kosong
+def _day_after(day):
+    if not day:
+        return None
+    return datetime.combine(date.fromisoformat(day) + timedelta(days=1), datetime.min.time()).timestamp()
+
+
+# Fungsi untuk membaca pesan yang belum diarsipkan (lebih baru dari hari `watermark`) secara
+# maju dari penyimpanan chat. Segmen yang seluruhnya lebih tua dari watermark tidak dibaca,
+# jadi biayanya sebanding dengan data baru, bukan panjang seluruh log.
+def _iter_unarchived_chunks(store, watermark):
+    for chunk in store.iter_messages(since=_day_after(watermark)):
+        items = [item for item in chunk if _day(item) and _day(item) > watermark]
+        if items:
+            yield items
+
+
+def _write_partition(path, day, items):
+    directory = os.path.join(path, f"date={day}")
+    os.makedirs(directory, exist_ok=True)
+    table = pa.Table.from_pylist([_to_record(item) for item in items], schema=_schema())
+    # Awalan titik membuat file sementara diabaikan pembaca dataset
+    tmp_path = os.path.join(directory, f".{_PART_FILE}.tmp")
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, os.path.join(directory, _PART_FILE))
+
+
+# Fungsi untuk mendapatkan hari pertama yang masih disimpan ("" jika retensi mati)
+def _retention_cutoff(retention_days, today=None):
+    if not retention_days:
+        return ''
+    today = date.fromisoformat(today) if today else date.today()
+    return (today - timedelta(days=retention_days)).isoformat()
+
+
+# Fungsi untuk mengekspor hari-hari yang sudah ditutup (sebelum hari ini) ke arsip Parquet.
+# Hanya pesan setelah hari terakhir di arsip yang dibaca, jadi biayanya sebanding dengan data baru.
+# Hari yang sudah melewati masa retensi tidak diekspor lagi.
+def export_closed_days(store, path=ARCHIVE_PATH, today=None, retention_days=CHAT_RETENTION_DAYS):
+    if not PYARROW_AVAILABLE:
+        return []
+    today = today or date.today().isoformat()
+    days = archived_days(path)
+    cutoff = _retention_cutoff(retention_days, today)
+    # Pembacaan berhenti di hari terakhir arsip atau di hari sebelum batas retensi
+    watermark = max(max(days) if days else '', (date.fromisoformat(cutoff) - timedelta(days=1)).isoformat() if cutoff else '')
+    by_day = {}
+    for items in _iter_unarchived_chunks(store, watermark):
+        for item in items:
+            day = _day(item)
+            if day < today:
+                by_day.setdefault(day, []).append(item)
+    for day, items in sorted(by_day.items()):
+        _write_partition(path, day, items)
+    return sorted(by_day)
+
+
+# Fungsi untuk membaca arsip per potongan dengan proyeksi kolom dan filter partisi:
+# hanya kolom yang diminta dibaca dari file Parquet
+def iter_archive(columns=ARCHIVE_COLUMNS, start=None, end=None, path=ARCHIVE_PATH):
+    if not PYARROW_AVAILABLE or not archived_days(path):
+        return
+    partitioning = ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+    # Skema eksplisit agar partisi lama yang belum punya kolom baru tetap terbaca (diisi null)
+    schema = _schema().append(pa.field('date', pa.string()))
+    dataset = ds.dataset(path, schema=schema, format='parquet', partitioning=partitioning)
+    expression = None
+    for condition in ([ds.field('date') >= start] if start else []) + ([ds.field('date') <= end] if end else []):
+        expression = condition if expression is None else expression & condition
+    for batch in dataset.to_batches(columns=list(columns), filter=expression):
+        if batch.num_rows:
+            yield batch.to_pylist()
+
+
+# Fungsi untuk membaca pesan analitik per potongan: hari yang sudah ditutup dari arsip
+# Parquet (hanya kolom `columns`) lalu pesan yang belum diarsipkan dari penyimpanan chat.
+# Pesan tanpa Timestamp di segmen yang lebih tua dari arsip tidak ikut terbaca.
+def iter_analytics_messages(store, columns=ARCHIVE_COLUMNS, path=ARCHIVE_PATH):
+    days = archived_days(path) if PYARROW_AVAILABLE else set()
+    watermark = max(days) if days else ''
+    yield from iter_archive(columns, path=path)
+    for chunk in store.iter_messages(since=_day_after(watermark)):
+        items = [{column: item.get(column) for column in columns} for item in chunk if not _day(item) or _day(item) > watermark]
+        if items:
+            yield items
+
+
+# Fungsi untuk menghapus pesan satu sesi dari semua partisi arsip.
+# Hanya kolom session_id yang dibaca untuk memeriksa partisi; partisi ditulis ulang jika perlu.
+def delete_session(session_id, path=ARCHIVE_PATH):
+    if not PYARROW_AVAILABLE:
+        return 0
+    removed = 0
+    for day in sorted(archived_days(path)):
+        part_path = os.path.join(path, f"date={day}", _PART_FILE)
+        sessions = pq.read_table(part_path, columns=['session_id'])['session_id']
+        if not pc.any(pc.equal(sessions, session_id)).as_py():
+            continue
+        table = pq.read_table(part_path)
+        kept = table.filter(pc.fill_null(pc.not_equal(table['session_id'], session_id), True))
+        removed += table.num_rows - kept.num_rows
+        tmp_path = os.path.join(path, f"date={day}", f".{_PART_FILE}.tmp")
+        pq.write_table(kept, tmp_path)
+        os.replace(tmp_path, part_path)
+    return removed
+
+
+# Fungsi retensi arsip: menghapus partisi hari yang seluruhnya lebih tua dari
+# CHAT_RETENTION_DAYS, sama seperti riwayat di penyimpanan chat
+def enforce_archive_retention(retention_days=CHAT_RETENTION_DAYS, path=ARCHIVE_PATH, today=None):
+    cutoff = _retention_cutoff(retention_days, today)
+    if not cutoff:
+        return {'removed': 0}
+    removed = 0
+    for day in sorted(archived_days(path)):
+        if day < cutoff:
+            shutil.rmtree(os.path.join(path, f"date={day}"), ignore_errors=True)
+            removed += 1
+    return {'removed': removed}
+
+
+_exporter_started = False
+_exporter_lock = threading.Lock()
+
+
+def _export_periodically(store, path, interval):
+    while True:
+        try:
+            exported = export_closed_days(store, path)
+            if exported:
+                print(f"Arsip chat diperbarui: {', '.join(exported)}")
+        except Exception as e:
+            print(f"Gagal mengekspor arsip chat ke {path}: {e}")
+        time.sleep(interval)
+
+
+# Fungsi untuk menyalakan ekspor arsip berkala sekali per proses
+def start_archive_exporter(store, path=ARCHIVE_PATH, interval=ARCHIVE_EXPORT_INTERVAL):
+    global _exporter_started
+    if not PYARROW_AVAILABLE:
+        return
+    with _exporter_lock:
+        if _exporter_started:
+            return
+        _exporter_started = True
+    threading.Thread(target=_export_periodically, args=(store, path, interval), name="chat-archive-exporter", daemon=True).start()
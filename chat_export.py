@@ -0,0 +1,109 @@
+import csv
+import io
+import json
+import os
+import tempfile
+import time
+import zlib
+
+from chat_store import CHAT_HISTORY_FIELDS
+
+EXPORT_CHUNK_SIZE = 1000  # jumlah pesan yang dibaca dan ditulis per potongan
+# File hasil ekspor ditulis ke direktori sementara (izin 0600) dan dihapus setelah diunduh
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), 'sedulurrasa-exports')
+EXPORT_MAX_AGE = 3600  # detik sebelum file ekspor yang tidak pernah diunduh dihapus
+# Format ekspor: (MIME type, ekstensi file)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+}
+
+
+def _in_range(item, start, end):
+    day = (item.get('timestamp') or '')[:10]
+    if start is not None and (not day or day < start):
+        return False
+    if end is not None and (not day or day > end):
+        return False
+    return True
+
+
+def _encode_csv(items, header=False):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    if header:
+        writer.writerow([column for _, column in CHAT_HISTORY_FIELDS])
+    writer.writerows([item.get(key, '') for key, _ in CHAT_HISTORY_FIELDS] for item in items)
+    return buffer.getvalue().encode('utf-8')
+
+
+def _encode_jsonl(items):
+    lines = (json.dumps({key: item.get(key) for key, _ in CHAT_HISTORY_FIELDS}, ensure_ascii=False) for item in items)
+    return ''.join(line + '\n' for line in lines).encode('utf-8')
+
+
+# Fungsi untuk menghasilkan isi ekspor riwayat chat sebagai potongan byte.
+# Pesan dibaca dari penyimpanan per potongan sehingga riwayat tidak pernah dimuat seluruhnya.
+# start/end berupa tanggal "YYYY-MM-DD" (inklusif); pesan tanpa Timestamp dilewati jika difilter.
+def iter_export(store, fmt='csv', session_id=None, start=None, end=None, compress=False, chunk_size=EXPORT_CHUNK_SIZE):
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Format ekspor tidak dikenal: {fmt}")
+    # wbits=31 menghasilkan format gzip lengkap dengan header dan checksum
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    encode = _encode_csv if fmt == 'csv' else _encode_jsonl
+
+    def emit(data):
+        return compressor.compress(data) if compressor else data
+
+    if fmt == 'csv':
+        yield emit(_encode_csv([], header=True))
+    for items in store.iter_messages(session_id, chunk_size):
+        if start is not None or end is not None:
+            items = [item for item in items if _in_range(item, start, end)]
+        if items:
+            yield emit(encode(items))
+    if compressor:
+        yield compressor.flush()
+
+
+# Fungsi untuk menghapus file ekspor lama yang tidak pernah diunduh
+def _remove_stale_exports(directory, max_age):
+    cutoff = time.time() - max_age
+    for entry in os.scandir(directory):
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            continue
+
+
+# Fungsi untuk menulis ekspor ke file di disk dan mengembalikan path-nya.
+# File ditulis sekali per potongan; pemanggil menghapusnya dengan discard_export setelah dipakai.
+def export_file(store, fmt='csv', session_id=None, start=None, end=None, compress=False, directory=EXPORT_DIR):
+    os.makedirs(directory, exist_ok=True)
+    _remove_stale_exports(directory, EXPORT_MAX_AGE)
+    _, extension = EXPORT_FORMATS[fmt]
+    fd, path = tempfile.mkstemp(suffix=f".{extension}.gz" if compress else f".{extension}", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in iter_export(store, fmt, session_id, start, end, compress):
+                f.write(chunk)
+    except BaseException:
+        discard_export(path)
+        raise
+    return path
+
+
+def discard_export(path):
+    try:
+        os.remove(path)
+    except (OSError, TypeError):
+        pass
+
+
+# Fungsi untuk mendapatkan nama file dan MIME type hasil ekspor
+def export_filename(fmt='csv', compress=False, name='chat_history'):
+    mime, extension = EXPORT_FORMATS[fmt]
+    if compress:
+        return f"{name}.{extension}.gz", 'application/gzip'
+    return f"{name}.{extension}", mime
@@ -0,0 +1,39 @@
+import uuid
+from collections import deque
+
+import streamlit as st
+
+from metrics import chat_metrics
+
+SEEN_SUBMISSIONS_MAX = 64  # jumlah kunci pengiriman terakhir yang diingat per sesi
+
+
+# Fungsi untuk menerima pesan pengguna tepat satu kali.
+# Setiap form memakai nonce yang diganti setelah pesan diterima; kunci form+nonce yang
+# sudah diproses disimpan di seen-set sesi sehingga rerun tidak mengirim ulang pesan.
+def accept_submission(form, text):
+    if not text or not text.strip():
+        return False
+    if 'seen_submissions' not in st.session_state:
+        st.session_state.seen_submissions = deque(maxlen=SEEN_SUBMISSIONS_MAX)
+    dedup_key = f"{form}:{st.session_state.submission_nonce}"
+    if dedup_key in st.session_state.seen_submissions:
+        chat_metrics.inc("duplicate_submission")
+        return False
+    st.session_state.seen_submissions.append(dedup_key)
+    st.session_state.submission_nonce = str(uuid.uuid4())
+    return True
+
+
+# Fungsi untuk menampilkan form pesan berkunci nonce. Mengembalikan teks yang dikirim
+# (tepat satu kali per pengiriman) atau None; input dikosongkan setelah dikirim.
+def submission_form(form, label=""):
+    if 'submission_nonce' not in st.session_state:
+        st.session_state.submission_nonce = str(uuid.uuid4())
+    nonce = st.session_state.submission_nonce
+    with st.form(f"{form}_form_{nonce}", clear_on_submit=True):
+        text = st.text_input(label, key=f"{form}_input_{nonce}")
+        submitted = st.form_submit_button("Kirim")
+    if submitted and accept_submission(form, text):
+        return text
+    return None
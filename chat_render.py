@@ -0,0 +1,52 @@
+import html
+import threading
+from collections import OrderedDict
+
+CHAT_RENDER_WINDOW = 50  # jumlah pesan terbaru yang ditampilkan di transkrip
+FRAGMENT_CACHE_SIZE = 20000  # jumlah potongan HTML pesan yang disimpan di memori
+
+_ROLE_TEMPLATES = {
+    'User': '<div class="user-message"><strong>Anda : </strong> {}</div>',
+    'Bot': '<div class="bot-message"><strong>SedulurRasa : </strong> {}</div>',
+}
+
+
+# Cache potongan HTML per id pesan, dipakai bersama semua sesi dan rerun.
+# Pesan tidak pernah berubah setelah ditulis, jadi escaping dan format HTML
+# cukup dilakukan sekali per pesan.
+class FragmentCache:
+    def __init__(self, max_size=FRAGMENT_CACHE_SIZE):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, item):
+        key = item.get('id')
+        with self._lock:
+            fragment = self._data.get(key) if key else None
+            if fragment is not None:
+                self._data.move_to_end(key)
+                return fragment
+        fragment = render_message(item)
+        if key:
+            with self._lock:
+                self._data[key] = fragment
+                while len(self._data) > self.max_size:
+                    self._data.popitem(last=False)
+        return fragment
+
+
+# Fungsi untuk membuat potongan HTML satu pesan (isi pesan di-escape)
+def render_message(item):
+    template = _ROLE_TEMPLATES['User'] if item['role'] == 'User' else _ROLE_TEMPLATES['Bot']
+    return template.format(html.escape(str(item['message'])))
+
+
+fragment_cache = FragmentCache()
+
+
+# Fungsi untuk menyusun HTML transkrip dari `window` pesan terakhir dengan satu join
+def render_chat_html(chat_history, window=CHAT_RENDER_WINDOW):
+    visible = chat_history[-window:] if window else chat_history
+    fragments = [fragment_cache.get(item) for item in visible]
+    return '<div class="chat-container">' + ''.join(fragments) + '</div>'
@@ -0,0 +1,1127 @@
+import atexit
+import csv
+import gzip
+import io
+import json
+import mmap
+import os
+import queue
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+from response_templates import fill_template, template_table
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: tanpa flock, log CSV hanya aman dipakai satu proses
+    fcntl = None
+
+CHAT_HISTORY_PATH = 'chat_history.csv'
+# Pasangan (kunci item riwayat, nama kolom CSV)
+CHAT_HISTORY_FIELDS = [
+    ('role', 'Role'),
+    ('message', 'Message'),
+    ('id', 'Id'),
+    ('timestamp', 'Timestamp'),
+    ('session_id', 'SessionId'),
+    ('intent', 'Intent'),
+    ('confidence', 'Confidence'),
+    ('template', 'Template'),
+    ('variables', 'Variables'),
+]
+CHAT_HISTORY_COLUMNS = [column for _, column in CHAT_HISTORY_FIELDS]
+CHAT_DB_PATH = 'chat_history.db'
+CHAT_PAGE_SIZE = 50  # jumlah pesan terbaru yang dimuat saat halaman Chatbot dibuka
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"  # format waktu lokal pada kolom Timestamp
+
+# Backend penyimpanan percakapan: "csv" (chat_history.csv bersama) atau "sqlite"
+CHAT_STORE_BACKEND = os.environ.get("SEDULURRASA_CHAT_STORE", "csv")
+
+# Kebijakan fsync untuk log chat:
+#   "none"     -> hanya flush ke OS (paling cepat)
+#   "interval" -> fsync paling sering sekali per FSYNC_INTERVAL detik
+#   "always"   -> fsync setiap kali menulis (paling tahan crash)
+FSYNC_POLICY = os.environ.get("SEDULURRASA_FSYNC_POLICY", "interval")
+FSYNC_INTERVAL = 1.0
+
+# Mode durabilitas penulisan riwayat:
+#   "async" -> pesan diantrekan dan ditulis thread latar belakang (balasan tidak menunggu disk)
+#   "sync"  -> pesan ditulis langsung sebelum balasan ditampilkan
+CHAT_DURABILITY = os.environ.get("SEDULURRASA_DURABILITY", "async")
+WRITE_QUEUE_MAX_SIZE = 10000  # jumlah penulisan yang boleh mengantre sebelum pemanggil ikut menunggu
+WRITE_BATCH_MAX_SIZE = 500  # jumlah pesan maksimum dalam satu penulisan gabungan
+WRITE_BATCH_MAX_WAIT = 0.05  # detik menunggu penulisan lain sebelum batch ditulis
+
+# Retensi riwayat chat
+CHAT_LOG_MAX_BYTES = 5 * 1024 * 1024  # ukuran file CSV aktif sebelum dirotasi menjadi segmen
+CHAT_LOG_MAX_AGE = 7 * 24 * 3600  # detik sejak pesan pertama di file aktif sebelum dirotasi
+CHAT_RETENTION_DAYS = 365  # hari sebelum riwayat lama dihapus (0 = simpan selamanya)
+RETENTION_INTERVAL = 3600  # detik antar pemeriksaan retensi di latar belakang
+SEGMENT_TIME_FORMAT = "%Y%m%d-%H%M%S"
+
+_TAIL_BLOCK_SIZE = 64 * 1024
+
+
+# Fungsi untuk menyimpan balasan bot yang berasal dari respons domain.yml sebagai
+# referensi template (+ variabel JSON) tanpa teks lengkapnya.
+# Mengembalikan (item, (referensi, teks template) atau None).
+def _encode_reply(item):
+    if item.get('role') != 'Bot' or item.get('template'):
+        return item, None
+    ref, variables = template_table.encode(item.get('message') or '')
+    if ref is None:
+        return item, None
+    encoded = dict(item, message='', template=ref, variables=json.dumps(variables, ensure_ascii=False) if variables else '')
+    return encoded, (ref, template_table.render(ref))
+
+
+def _item_to_row(item, session_id=None):
+    item = dict(item, session_id=item.get('session_id') or session_id or '')
+    return [item.get(key, '') for key, _ in CHAT_HISTORY_FIELDS]
+
+
+def _row_to_item(row):
+    return {key: row.get(column) or '' for key, column in CHAT_HISTORY_FIELDS}
+
+
+# Fungsi untuk membuat item riwayat baru dengan Id permanen dan waktu pembuatan
+def new_message(role, message, **fields):
+    return {'role': role, 'message': message, 'id': str(uuid.uuid4()), 'timestamp': datetime.now().strftime(TIMESTAMP_FORMAT), **fields}
+
+
+def _parse_timestamp(value):
+    try:
+        return datetime.strptime(value, TIMESTAMP_FORMAT).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+
+# Fungsi untuk membaca semua baris CSV (termasuk field berisi baris baru) beserta offsetnya
+def _scan_lines(f, start, end):
+    f.seek(start)
+    lines = []
+    offset = start
+    pending, pending_offset = b'', start
+    while offset < end:
+        line = f.readline()
+        if not line:
+            break
+        offset += len(line)
+        if not pending:
+            pending_offset = offset - len(line)
+        pending += line
+        # Kutip berpasangan berarti satu record CSV sudah lengkap
+        if pending.count(b'"') % 2 == 0:
+            lines.append((pending_offset, pending.rstrip(b'\n')))
+            pending = b''
+    if pending:
+        lines.append((pending_offset, pending.rstrip(b'\n')))
+    return lines
+
+
+# Fungsi untuk membaca baris file biner sampai offset `end` (tulisan yang datang kemudian diabaikan)
+def _read_until(f, end=None):
+    offset = 0
+    for line in f:
+        offset += len(line)
+        if end is not None and offset > end:
+            return
+        yield line
+
+
+# Fungsi untuk membuka file log sebagai file biner yang bisa di-seek.
+# Segmen .gz dibaca utuh ke memori (ukurannya dibatasi CHAT_LOG_MAX_BYTES).
+def _open_binary(path):
+    if path.endswith('.gz'):
+        with gzip.open(path, 'rb') as f:
+            return io.BytesIO(f.read())
+    return open(path, 'rb')
+
+
+# Fungsi untuk membaca record CSV secara mundur dari offset `end` sampai `start` tanpa
+# membaca seluruh file. Menghasilkan (offset awal record, isi record) mulai dari yang terbaru.
+def _iter_records_backward(f, start, end):
+    pos, buffer, last_offset = end, b'', end
+    while pos > start:
+        size = min(_TAIL_BLOCK_SIZE, pos - start)
+        pos -= size
+        f.seek(pos)
+        buffer = f.read(size) + buffer
+        if pos > start:
+            # Baris pertama di potongan ini belum tentu lengkap
+            head, newline, rest = buffer.partition(b'\n')
+            if not newline:
+                continue
+            chunk_offset, chunk, buffer = pos + len(head) + 1, rest, head
+        else:
+            chunk_offset, chunk, buffer = pos, buffer, b''
+        lines, offset = [], chunk_offset
+        for line in chunk.split(b'\n'):
+            lines.append((offset, line))
+            offset += len(line) + 1
+        for offset, line in reversed(lines):
+            if not line:
+                continue
+            if line.count(b'"') % 2:
+                # Ada pesan yang memuat baris baru; baca maju agar record tidak terpotong
+                yield from reversed(_scan_lines(f, start, last_offset))
+                return
+            last_offset = offset
+            yield offset, line
+
+
+# Fungsi untuk membaca pesan satu file log secara mundur, dari yang terbaru.
+# Baris yang jelas bukan milik sesi dilewati sebelum di-parse (pencarian byte pada baris).
+def _iter_items_backward(f, end=None, session_id=None):
+    f.seek(0)
+    header = f.readline()
+    columns = next(csv.reader([header.decode('utf-8')]))
+    if end is None:
+        end = f.seek(0, os.SEEK_END)
+    needle = session_id.encode('utf-8') if session_id else None
+    for _, line in _iter_records_backward(f, len(header), end):
+        if needle is not None and needle not in line:
+            continue
+        item = _row_to_item(dict(zip(columns, next(csv.reader([line.decode('utf-8')])))))
+        if session_id is not None and item['session_id'] != session_id:
+            continue
+        yield item
+
+
+# Fungsi untuk membaca satu file log secara berurutan per potongan `chunk_size` pesan.
+# `since` berupa teks Timestamp; format waktunya bisa dibandingkan langsung sebagai string.
+def _iter_file(f, end, session_id, chunk_size, since=None):
+    reader = csv.DictReader(line.decode('utf-8') for line in _read_until(f, end))
+    chunk = []
+    for row in reader:
+        if row.get('Message') is None:
+            continue
+        item = _row_to_item(row)
+        if session_id is not None and item['session_id'] != session_id:
+            continue
+        if since is not None and item['timestamp'] and item['timestamp'] < since:
+            continue
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _write_rows(path, items, compress=False):
+    tmp_path = f"{path}.tmp"
+    opener = gzip.open if compress else open
+    with opener(tmp_path, 'wt', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(CHAT_HISTORY_COLUMNS)
+        writer.writerows(_item_to_row(item) for item in items)
+    os.replace(tmp_path, path)
+
+
+# Fungsi untuk menghapus pesan satu sesi dari sebuah file log (biasa atau .gz).
+# Mengembalikan jumlah pesan yang dihapus; file hanya ditulis ulang jika ada yang dihapus.
+def _remove_session_rows(path, session_id):
+    compressed = path.endswith('.gz')
+    opener = gzip.open if compressed else open
+    try:
+        with opener(path, 'rt', newline='', encoding='utf-8') as f:
+            items = [_row_to_item(row) for row in csv.DictReader(f) if row.get('Message') is not None]
+    except FileNotFoundError:
+        return 0
+    kept = [item for item in items if item['session_id'] != session_id]
+    if len(kept) != len(items):
+        _write_rows(path, kept, compressed)
+    return len(items) - len(kept)
+
+
+# Fungsi untuk mendapatkan session id yang muncul di sebuah file log (biasa atau .gz)
+def _file_sessions(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', newline='', encoding='utf-8') as f:
+        return {row.get('SessionId') or '' for row in csv.DictReader(f) if row.get('Message') is not None}
+
+
+# Fungsi untuk memeriksa apakah sebuah file memuat `needle` sebelum offset `end` tanpa parsing CSV
+def _contains_bytes(f, end, needle):
+    if not end:
+        return False
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        return data.find(needle, 0, end) != -1
+
+
+def _gzip_file(path, target):
+    tmp_path = f"{target}.tmp"
+    with open(path, 'rb') as src, gzip.open(tmp_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.replace(tmp_path, target)
+    os.remove(path)
+
+
+# Fungsi untuk membaca waktu rotasi dari nama segmen (chat_history.<waktu>[-n])
+def _segment_time(stem):
+    try:
+        return datetime.strptime(stem.rsplit('.', 1)[-1][:15], SEGMENT_TIME_FORMAT).timestamp()
+    except ValueError:
+        return None
+
+
+# Urutan segmen: waktu rotasi lalu nomor urut (-1, -2, ..., -10) untuk rotasi pada detik yang sama
+def _segment_order(stem):
+    stamp = stem.rsplit('.', 1)[-1]
+    suffix = stamp[len('YYYYmmdd-HHMMSS-'):]
+    return stamp[:15], int(suffix) if suffix.isdigit() else 0
+
+
+# Fungsi untuk mengunci file secara eksklusif lintas proses (flock)
+@contextmanager
+def _file_lock(path):
+    if fcntl is None:
+        yield
+        return
+    with open(path, 'a') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+# Listener penyimpanan: objek dengan on_append(groups), on_reset(session_id) dan
+# on_close() (semuanya opsional) yang dipanggil setelah operasi berhasil.
+# Dalam mode write-behind listener berjalan di thread penulis, bukan di jalur balasan.
+class _StoreListeners:
+    def add_listener(self, listener):
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    def _notify(self, event, *args):
+        for listener in self.listeners:
+            handler = getattr(listener, event, None)
+            if handler is None:
+                continue
+            try:
+                handler(*args)
+            except Exception as e:
+                print(f"Listener penyimpanan chat gagal ({event}): {e}")
+
+
+# Tabel template milik penyimpanan: teks setiap referensi template yang pernah ditulis
+# disimpan bersama riwayatnya (file sidecar untuk CSV, tabel templates untuk SQLite),
+# jadi baris yang hanya berisi referensi tetap terbaca walaupun domain.yml atau
+# response_templates.json berubah atau hilang. Teks di-intern sehingga semua pesan
+# dengan template yang sama berbagi satu objek string.
+class _StoredTemplates:
+    # Fungsi untuk mengubah balasan bot menjadi referensi template sebelum ditulis.
+    # Mengembalikan (groups yang sudah dikodekan, {referensi: teks} yang belum tercatat).
+    def _encode_groups(self, groups):
+        encoded, new_templates = [], {}
+        for session_id, items in groups:
+            pairs = [_encode_reply(item) for item in items]
+            encoded.append((session_id, [item for item, _ in pairs]))
+            for _, template in pairs:
+                if template is not None and template[0] not in self._templates:
+                    new_templates[template[0]] = template[1]
+        return encoded, new_templates
+
+    def _remember_templates(self, templates):
+        for ref, text in templates.items():
+            if text is not None:
+                self._templates[ref] = sys.intern(text)
+
+    def _template_text(self, ref):
+        text = self._templates.get(ref)
+        if text is None:
+            # Dicatat proses lain, atau baris lama yang ditulis sebelum tabel ini ada
+            self._remember_templates(self._load_templates())
+            if ref not in self._templates:
+                self._remember_templates({ref: template_table.render(ref)})
+            text = self._templates.get(ref)
+        return text
+
+    # Fungsi untuk mengisi kembali teks balasan yang disimpan sebagai referensi template
+    def _resolve(self, items):
+        for item in items:
+            if item.get('template') and not item.get('message'):
+                text = self._template_text(item['template'])
+                if text is not None:
+                    item['message'] = fill_template(text, json.loads(item['variables']) if item.get('variables') else None)
+        return items
+
+
+# Log chat append-only dalam format CSV (kompatibel dengan chat_history.csv lama).
+# Setiap pesan baru hanya ditambahkan di akhir file, sehingga biaya menyimpan
+# satu pesan tetap O(1) berapa pun panjang riwayatnya. Halaman terbaru dibaca
+# mundur dari akhir file, jadi biayanya tidak bergantung pada panjang log.
+#
+# Retensi: file aktif dirotasi menjadi segmen chat_history.<waktu>.csv setelah
+# melewati CHAT_LOG_MAX_BYTES atau CHAT_LOG_MAX_AGE, sehingga file yang ditulis dan
+# dibaca tetap kecil. Worker retensi memadatkan segmen menjadi .csv.gz dan menghapus
+# segmen yang lebih tua dari CHAT_RETENTION_DAYS. Kursor halaman berupa Id pesan,
+# jadi tetap berlaku setelah rotasi, pemadatan, maupun penulisan ulang file oleh reset.
+#
+# Beberapa proses (misalnya beberapa proses Streamlit di satu host) boleh memakai log
+# yang sama: penulisan, rotasi, pemadatan dan reset dikunci dengan flock pada file
+# chat_history.csv.lock, dan proses yang file aktifnya sudah diganti proses lain
+# membukanya kembali. flock tidak tersedia di Windows dan tidak andal di file system
+# jaringan; untuk beberapa replika gunakan SEDULURRASA_CHAT_STORE=sqlite.
+class CsvChatLog(_StoredTemplates, _StoreListeners):
+    def __init__(self, path=CHAT_HISTORY_PATH, fsync_policy=FSYNC_POLICY, fsync_interval=FSYNC_INTERVAL,
+                 max_bytes=CHAT_LOG_MAX_BYTES, max_age=CHAT_LOG_MAX_AGE, retention_days=CHAT_RETENTION_DAYS):
+        self.path = path
+        self.listeners = []
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.retention_days = retention_days
+        self.rotations = 0
+        # Di-set saat rotasi agar worker retensi segera memadatkan segmen baru
+        self.retention_event = threading.Event()
+        self._base = os.path.splitext(path)[0]
+        self._lock = threading.Lock()
+        # Melindungi segmen dari pemadatan dan penghapusan per sesi yang berjalan bersamaan
+        self._segment_lock = threading.Lock()
+        self._lock_path = f"{path}.lock"
+        self._segment_lock_path = f"{path}.segments.lock"
+        self._templates_path = f"{self._base}.templates.json"
+        self._templates = {}
+        self._segment_index = {}
+        self._file = None
+        self._started_at = None
+        self._last_fsync = 0.0
+        self._compacted = False
+
+    # Kunci file aktif: lock thread di dalam proses ditambah flock lintas proses, karena
+    # rotasi, pemadatan dan reset mengganti file yang juga ditulis proses/replika lain
+    @contextmanager
+    def _locked(self):
+        with self._lock, _file_lock(self._lock_path):
+            yield
+
+    # Kunci segmen; selalu diambil sebelum kunci file aktif jika keduanya diperlukan
+    @contextmanager
+    def _segments_locked(self):
+        with self._segment_lock, _file_lock(self._segment_lock_path):
+            yield
+
+    # Pemadatan dijalankan sekali per proses sebelum log dibaca atau ditulis
+    def _ensure_compacted(self):
+        if not self._compacted:
+            self._compact_locked()
+            self._compacted = True
+
+    def _first_timestamp(self):
+        try:
+            with open(self.path, newline='', encoding='utf-8') as f:
+                row = next(csv.DictReader(f), None)
+        except FileNotFoundError:
+            return None
+        return _parse_timestamp(row.get('Timestamp')) if row and row.get('Timestamp') else None
+
+    # File yang terbuka sudah bukan file aktif jika proses lain merotasi atau menggantinya
+    def _is_current(self, f):
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        opened = os.fstat(f.fileno())
+        return (current.st_dev, current.st_ino) == (opened.st_dev, opened.st_ino)
+
+    def _drop_stale_locked(self):
+        if self._file is not None and not self._is_current(self._file):
+            self._file.close()
+            self._file = None
+
+    def _open(self):
+        self._drop_stale_locked()
+        if self._file is None:
+            self._ensure_compacted()
+            is_new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            self._started_at = time.time() if is_new else (self._first_timestamp() or time.time())
+            self._file = open(self.path, 'a', newline='', encoding='utf-8')
+            if is_new:
+                csv.writer(self._file, lineterminator='\n').writerow(CHAT_HISTORY_COLUMNS)
+        return self._file
+
+    def _sync(self, f):
+        f.flush()
+        now = time.monotonic()
+        if self.fsync_policy == "always" or (self.fsync_policy == "interval" and now - self._last_fsync >= self.fsync_interval):
+            os.fsync(f.fileno())
+            self._last_fsync = now
+
+    # Fungsi untuk menambahkan pesan (dict dengan 'role', 'message' dan 'id') ke akhir log.
+    # Log CSV dipakai bersama semua sesi; session_id dicatat per baris dan pembacaan
+    # dengan session_id hanya mengembalikan pesan sesi tersebut.
+    def append(self, items, session_id=None):
+        self.append_many([(session_id, items)])
+
+    # Fungsi untuk menulis pesan dari banyak sesi sekaligus: satu write dan satu sync
+    def append_many(self, groups):
+        encoded, new_templates = self._encode_groups(groups)
+        rows = [_item_to_row(item, session_id) for session_id, items in encoded for item in items]
+        if not rows:
+            return
+        with self._locked():
+            if new_templates:
+                self._save_templates_locked(new_templates)
+            f = self._open()
+            csv.writer(f, lineterminator='\n').writerows(rows)
+            self._sync(f)
+            if self._should_rotate(os.fstat(f.fileno()).st_size, self._started_at):
+                self._rotate_locked()
+        self._notify('on_append', groups)
+
+    def _load_templates(self):
+        try:
+            with open(self._templates_path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"Gagal membaca tabel template {self._templates_path}: {e}")
+            return {}
+
+    # Tabel template ditulis di bawah kunci yang sama dengan file aktif, sebelum baris yang memakainya
+    def _save_templates_locked(self, templates):
+        table = {**self._load_templates(), **templates}
+        tmp_path = f"{self._templates_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(table, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._templates_path)
+        self._remember_templates(table)
+
+    def _should_rotate(self, size, started_at):
+        if self.max_bytes and size >= self.max_bytes:
+            return True
+        return bool(self.max_age and started_at and time.time() - started_at >= self.max_age)
+
+    # Fungsi untuk memindahkan file aktif menjadi segmen; file aktif baru dibuat saat penulisan berikutnya
+    def _rotate_locked(self):
+        self._close_locked()
+        stamp = datetime.now().strftime(SEGMENT_TIME_FORMAT)
+        stem, n = f"{self._base}.{stamp}", 1
+        while os.path.exists(f"{stem}.csv") or os.path.exists(f"{stem}.csv.gz"):
+            stem, n = f"{self._base}.{stamp}-{n}", n + 1
+        sessions = _file_sessions(self.path)
+        os.replace(self.path, f"{stem}.csv")
+        self._write_segment_sessions(stem, sessions)
+        self._started_at = None
+        self.rotations += 1
+        self.retention_event.set()
+
+    # Fungsi untuk mendapatkan segmen yang sudah dirotasi (tanpa ekstensi), dari yang tertua
+    def _segment_stems(self):
+        directory = os.path.dirname(self._base) or '.'
+        prefix = os.path.basename(self._base) + '.'
+        stems = set()
+        for name in os.listdir(directory):
+            if not name.startswith(prefix):
+                continue
+            if name.endswith('.csv.gz'):
+                stem = name[:-7]
+            elif name.endswith('.csv'):
+                stem = name[:-4]
+            else:
+                continue
+            if _segment_time(stem) is not None:
+                stems.add(os.path.join(os.path.dirname(self._base), stem))
+        return sorted(stems, key=_segment_order)
+
+    # Indeks sesi per segmen: file <segmen>.sessions.json berisi session id yang ada di
+    # segmen tersebut dan ditulis saat rotasi. Segmen tidak pernah ditambah setelah
+    # dirotasi, jadi pembacaan satu sesi hanya membuka segmen yang memuat sesi itu.
+    def _segment_sessions(self, stem):
+        sessions = self._segment_index.get(stem)
+        if sessions is not None:
+            return sessions
+        try:
+            with open(f"{stem}.sessions.json", encoding='utf-8') as f:
+                sessions = set(json.load(f))
+        except (OSError, ValueError):
+            # Segmen dari versi lama tanpa indeks: indeks dibuat sekali dari isinya
+            path = f"{stem}.csv" if os.path.exists(f"{stem}.csv") else f"{stem}.csv.gz"
+            try:
+                sessions = _file_sessions(path)
+            except FileNotFoundError:
+                return set()
+            self._write_segment_sessions(stem, sessions)
+        self._segment_index[stem] = sessions
+        return sessions
+
+    def _write_segment_sessions(self, stem, sessions):
+        path = f"{stem}.sessions.json"
+        try:
+            with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+                json.dump(sorted(sessions), f, ensure_ascii=False)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            print(f"Gagal menyimpan indeks sesi {path}: {e}")
+        self._segment_index[stem] = set(sessions)
+
+    # Fungsi untuk menghapus sebuah segmen beserta indeks sesinya
+    def _remove_segment(self, stem):
+        for path in (f"{stem}.csv", f"{stem}.csv.gz", f"{stem}.sessions.json"):
+            if os.path.exists(path):
+                os.remove(path)
+        self._segment_index.pop(stem, None)
+
+    # Fungsi untuk memeriksa apakah sebuah sumber (segmen, atau file aktif jika stem None)
+    # mungkin memuat pesan sesi; tanpa session_id semua sumber dibaca
+    def _may_contain(self, stem, session_id, f=None, size=None):
+        if session_id is None:
+            return True
+        if stem is None:
+            return _contains_bytes(f, size, session_id.encode('utf-8'))
+        return session_id in self._segment_sessions(stem)
+
+    def _open_segment(self, stem):
+        # Dicoba dua kali: segmen bisa saja baru dikompres di antara pengecekan dan pembukaan
+        for _ in range(2):
+            path = f"{stem}.csv" if os.path.exists(f"{stem}.csv") else f"{stem}.csv.gz"
+            try:
+                return _open_binary(path)
+            except FileNotFoundError:
+                continue
+        return None
+
+    def _prepare_read(self):
+        self._ensure_compacted()
+        if self._file is not None:
+            self._file.flush()
+        return os.path.exists(self.path)
+
+    # Fungsi untuk membaca seluruh isi log (segmen lama lalu file aktif)
+    def read(self, session_id=None):
+        return [item for chunk in self.iter_messages(session_id) for item in chunk]
+
+    # Fungsi untuk membaca seluruh log secara berurutan per potongan `chunk_size` pesan.
+    # Hanya baris yang sudah ada saat pembacaan dimulai yang dibaca, dan lock tidak
+    # ditahan selama membaca sehingga penulisan tetap berjalan.
+    # Dengan `since` (detik epoch) pesan yang lebih tua dilewati, dan segmen yang dirotasi
+    # sebelum `since` tidak dibuka sama sekali. Pesan tanpa Timestamp selalu ikut dibaca.
+    def iter_messages(self, session_id=None, chunk_size=1000, since=None):
+        with self._locked():
+            end = os.path.getsize(self.path) if self._prepare_read() else None
+            stems = self._segment_stems()
+        since_text = datetime.fromtimestamp(since).strftime(TIMESTAMP_FORMAT) if since is not None else None
+        for stem in stems:
+            # Segmen hanya berisi pesan sebelum waktu rotasinya
+            if since is not None and _segment_time(stem) + 1 < since:
+                continue
+            if not self._may_contain(stem, session_id):
+                continue
+            f = self._open_segment(stem)
+            if f is None:
+                continue
+            with f:
+                for chunk in _iter_file(f, None, session_id, chunk_size, since_text):
+                    yield self._resolve(chunk)
+        if end is not None:
+            with open(self.path, 'rb') as f:
+                if not self._may_contain(None, session_id, f, end):
+                    return
+                for chunk in _iter_file(f, end, session_id, chunk_size, since_text):
+                    yield self._resolve(chunk)
+
+    # Fungsi untuk membuka file aktif (beserta ukurannya saat dibuka) atau sebuah segmen.
+    # File yang sudah terbuka tetap terbaca walaupun kemudian dirotasi atau diganti.
+    def _open_source(self, stem):
+        if stem is None:
+            with self._locked():
+                if not self._prepare_read():
+                    return None, None
+                f = open(self.path, 'rb')
+                return f, os.fstat(f.fileno()).st_size
+        return self._open_segment(stem), None
+
+    # Fungsi untuk membaca satu halaman pesan terbaru sebelum kursor `before`.
+    # Halaman berlanjut dari file aktif ke segmen yang lebih lama; dengan session_id
+    # hanya pesan sesi tersebut yang dikembalikan.
+    # Kursor berupa Id pesan tertua dari halaman sebelumnya; pesan dibaca mundur sampai
+    # pesan itu ditemukan, di file mana pun pesan itu sekarang berada.
+    # Mengembalikan (pesan, kursor halaman sebelumnya atau None jika sudah habis).
+    def read_page(self, session_id=None, limit=CHAT_PAGE_SIZE, before=None):
+        with self._locked():
+            live = [None] if self._prepare_read() else []
+            sources = self._segment_stems() + live
+        items = []
+        for stem in reversed(sources):
+            if stem is not None and not self._may_contain(stem, session_id):
+                continue
+            f, size = self._open_source(stem)
+            if f is None:
+                continue
+            with f:
+                if stem is None and not self._may_contain(None, session_id, f, size):
+                    continue
+                for item in _iter_items_backward(f, size, session_id):
+                    if before is not None:
+                        if item['id'] == before:
+                            before = None
+                        continue
+                    if len(items) == limit:
+                        return self._resolve(items[::-1]), items[-1]['id']
+                    items.append(item)
+        # Kursor yang tidak ditemukan (pesannya sudah dihapus) berarti tidak ada halaman lagi
+        return self._resolve(items[::-1]), None
+
+    def _close_locked(self):
+        if self._file is not None:
+            self._sync(self._file)
+            self._file.close()
+            self._file = None
+
+    # Pemadatan: tulis ulang log sekali per proses sebelum mulai dipakai.
+    # Baris terakhir yang terpotong (misalnya kutip yang belum ditutup akibat crash)
+    # dirapikan agar baris baru tidak ikut tertelan, header diperbarui ke kolom
+    # terbaru, dan pesan lama tanpa Id diberi Id permanen. File diganti secara atomik.
+    def _compact_locked(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, newline='', encoding='utf-8') as f:
+            items = [_row_to_item(row) for row in csv.DictReader(f) if row.get('Role') and row.get('Message') is not None]
+        for item in items:
+            if not item['id']:
+                item['id'] = str(uuid.uuid4())
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(CHAT_HISTORY_COLUMNS)
+            writer.writerows(_item_to_row(item) for item in items)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def compact(self):
+        with self._locked():
+            self._close_locked()
+            self._compact_locked()
+            self._compacted = True
+
+    # Fungsi retensi (dipanggil worker latar belakang): merotasi file aktif yang sudah
+    # terlalu tua meski tidak ada penulisan baru, memadatkan segmen menjadi .csv.gz,
+    # dan menghapus segmen yang melewati masa retensi
+    def enforce_retention(self):
+        cutoff = time.time() - self.retention_days * 86400 if self.retention_days else None
+        compressed = removed = 0
+        with self._segments_locked():
+            with self._locked():
+                self._ensure_compacted()
+                self._drop_stale_locked()
+                if os.path.exists(self.path):
+                    started_at = self._started_at if self._file is not None else self._first_timestamp()
+                    if self._should_rotate(os.path.getsize(self.path), started_at):
+                        self._rotate_locked()
+            for stem in self._segment_stems():
+                if cutoff is not None and _segment_time(stem) < cutoff:
+                    self._remove_segment(stem)
+                    removed += 1
+                elif os.path.exists(f"{stem}.csv"):
+                    _gzip_file(f"{stem}.csv", f"{stem}.csv.gz")
+                    compressed += 1
+        return {'compressed': compressed, 'removed': removed}
+
+    def close(self):
+        with self._locked():
+            self._close_locked()
+        self._notify('on_close')
+
+    # Fungsi untuk menghapus riwayat satu sesi dari file aktif dan segmen yang memuatnya
+    # menurut indeks sesi (pesan sesi lain tidak tersentuh), atau seluruh log jika
+    # session_id kosong. Biayanya sebanding dengan segmen milik sesi, bukan seluruh riwayat.
+    def reset(self, session_id=None):
+        with self._segments_locked():
+            with self._locked():
+                self._close_locked()
+                if session_id is None:
+                    if os.path.exists(self.path):
+                        os.remove(self.path)
+                elif os.path.exists(self.path):
+                    with open(self.path, 'rb') as f:
+                        found = self._may_contain(None, session_id, f, os.fstat(f.fileno()).st_size)
+                    if found:
+                        _remove_session_rows(self.path, session_id)
+            for stem in self._segment_stems():
+                if session_id is None:
+                    self._remove_segment(stem)
+                    continue
+                sessions = self._segment_sessions(stem)
+                if session_id not in sessions:
+                    continue
+                for path in (f"{stem}.csv", f"{stem}.csv.gz"):
+                    _remove_session_rows(path, session_id)
+                self._write_segment_sessions(stem, sessions - {session_id})
+        self._notify('on_reset', session_id)
+
+    def stats(self):
+        stems = self._segment_stems()
+        return {
+            'size': os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            'segments': len(stems),
+            'rotations': self.rotations,
+        }
+
+
+# Penyimpanan percakapan berbasis SQLite (mode WAL) dengan tabel sessions dan
+# messages. Setiap sesi hanya membaca dan menulis barisnya sendiri lewat indeks,
+# dan WAL memungkinkan banyak pembaca berjalan bersamaan dengan satu penulis.
+class SqliteChatStore(_StoredTemplates, _StoreListeners):
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        id TEXT PRIMARY KEY,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+        role TEXT NOT NULL,
+        message TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        uid TEXT,
+        intent TEXT,
+        confidence REAL,
+        template TEXT,
+        variables TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_messages_session ON messages(session_id, id);
+    CREATE INDEX IF NOT EXISTS idx_messages_created_at ON messages(created_at);
+    CREATE TABLE IF NOT EXISTS templates (
+        ref TEXT PRIMARY KEY,
+        text TEXT NOT NULL
+    );
+    """
+
+    def __init__(self, path=CHAT_DB_PATH, fsync_policy=FSYNC_POLICY, retention_days=CHAT_RETENTION_DAYS):
+        self.path = path
+        self.fsync_policy = fsync_policy
+        self.retention_days = retention_days
+        self.listeners = []
+        self._local = threading.local()
+        self._templates = {}
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+            self._migrate(conn)
+
+    # Menambahkan kolom baru pada database yang dibuat versi sebelumnya
+    def _migrate(self, conn):
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(messages)")}
+        for column, column_type in (('uid', 'TEXT'), ('intent', 'TEXT'), ('confidence', 'REAL'), ('template', 'TEXT'), ('variables', 'TEXT')):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE messages ADD COLUMN {column} {column_type}")
+
+    # Koneksi SQLite tidak boleh dipakai lintas thread, jadi satu koneksi per thread
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=" + ("FULL" if self.fsync_policy == "always" else "NORMAL"))
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def append(self, items, session_id=None):
+        self.append_many([(session_id, items)])
+
+    # Fungsi untuk menulis pesan dari banyak sesi dalam satu transaksi
+    def append_many(self, groups):
+        groups = [(session_id or 'default', items) for session_id, items in groups if items]
+        if not groups:
+            return
+        now = time.time()
+        encoded, new_templates = self._encode_groups(groups)
+        rows = [
+            (session_id, item['role'], item['message'], _parse_timestamp(item.get('timestamp')), item.get('id'),
+             item.get('intent'), item.get('confidence'), item.get('template') or None, item.get('variables') or None)
+            for session_id, items in encoded
+            for item in items
+        ]
+        with self._connect() as conn:
+            # Teks template dicatat dalam transaksi yang sama dengan pesan yang memakainya
+            conn.executemany("INSERT OR IGNORE INTO templates (ref, text) VALUES (?, ?)", list(new_templates.items()))
+            conn.executemany(
+                "INSERT INTO sessions (id, created_at, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET updated_at = excluded.updated_at",
+                [(session_id, now, now) for session_id in dict.fromkeys(session_id for session_id, _ in groups)],
+            )
+            conn.executemany(
+                "INSERT INTO messages (session_id, role, message, created_at, uid, intent, confidence, template, variables) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        self._remember_templates(new_templates)
+        self._notify('on_append', groups)
+
+    COLUMNS = "id, role, message, uid, created_at, session_id, intent, confidence, template, variables"
+
+    def _load_templates(self):
+        return dict(self._connect().execute("SELECT ref, text FROM templates"))
+
+    @staticmethod
+    def _to_item(row):
+        rowid, role, message, uid, created_at, session_id, intent, confidence, template, variables = row
+        return {
+            'role': role,
+            'message': message,
+            'id': uid or f"db-{rowid}",
+            'timestamp': datetime.fromtimestamp(created_at).strftime(TIMESTAMP_FORMAT),
+            'session_id': session_id,
+            'intent': intent,
+            'confidence': confidence,
+            'template': template,
+            'variables': variables,
+        }
+
+    def read(self, session_id=None):
+        conn = self._connect()
+        if session_id is None:
+            cursor = conn.execute(f"SELECT {self.COLUMNS} FROM messages ORDER BY id")
+        else:
+            cursor = conn.execute(f"SELECT {self.COLUMNS} FROM messages WHERE session_id = ? ORDER BY id", (session_id,))
+        return self._resolve([self._to_item(row) for row in cursor])
+
+    # Fungsi untuk membaca pesan secara berurutan per potongan `chunk_size` pesan
+    # (dengan `since`, hanya pesan sejak detik epoch tersebut lewat indeks created_at)
+    def iter_messages(self, session_id=None, chunk_size=1000, since=None):
+        conditions, params = [], []
+        if session_id is not None:
+            conditions.append("session_id = ?")
+            params.append(session_id)
+        if since is not None:
+            conditions.append("created_at >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        cursor = self._connect().execute(f"SELECT {self.COLUMNS} FROM messages {where} ORDER BY id", params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield self._resolve([self._to_item(row) for row in rows])
+
+    # Fungsi untuk membaca satu halaman pesan terbaru lewat indeks (session_id, id)
+    def read_page(self, session_id=None, limit=CHAT_PAGE_SIZE, before=None):
+        conditions, params = [], []
+        if session_id is not None:
+            conditions.append("session_id = ?")
+            params.append(session_id)
+        if before is not None:
+            conditions.append("id < ?")
+            params.append(int(before))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._connect().execute(
+            f"SELECT {self.COLUMNS} FROM messages {where} ORDER BY id DESC LIMIT ?",
+            (*params, limit + 1),
+        ).fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit][::-1]
+        cursor = str(rows[0][0]) if rows and has_more else None
+        return self._resolve([self._to_item(row) for row in rows]), cursor
+
+    # Fungsi untuk menghapus riwayat satu sesi (atau semua sesi jika session_id kosong)
+    def reset(self, session_id=None):
+        with self._connect() as conn:
+            if session_id is None:
+                conn.execute("DELETE FROM messages")
+                conn.execute("DELETE FROM sessions")
+            else:
+                conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        self._notify('on_reset', session_id)
+
+    # Fungsi retensi: menghapus pesan yang melewati masa retensi lewat indeks created_at
+    # beserta sesi yang tidak lagi punya pesan
+    def enforce_retention(self):
+        if not self.retention_days:
+            return {'removed': 0}
+        cutoff = time.time() - self.retention_days * 86400
+        with self._connect() as conn:
+            removed = conn.execute("DELETE FROM messages WHERE created_at < ?", (cutoff,)).rowcount
+            if removed:
+                conn.execute("DELETE FROM sessions WHERE id NOT IN (SELECT DISTINCT session_id FROM messages)")
+        return {'removed': removed}
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+        self._notify('on_close')
+
+
+# Penulis write-behind di depan penyimpanan percakapan.
+# append() hanya memasukkan pesan ke antrean terbatas; satu thread latar belakang
+# mengambil penulisan dari semua sesi dan menggabungkannya menjadi satu
+# append_many (satu write + sync untuk CSV, satu transaksi untuk SQLite) dengan
+# urutan yang sama seperti saat diantrekan.
+# Pembacaan dan reset menunggu antrean kosong agar sesi selalu membaca tulisannya sendiri.
+class WriteBehindStore:
+    def __init__(self, store, max_queue=WRITE_QUEUE_MAX_SIZE, batch_size=WRITE_BATCH_MAX_SIZE, max_wait=WRITE_BATCH_MAX_WAIT):
+        self.store = store
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="chat-store-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # Salinan item dibuat saat diantrekan karena dict aslinya masih diubah oleh sesi
+    def append(self, items, session_id=None):
+        if not items:
+            return
+        if self._closed:
+            self.store.append(items, session_id)
+            return
+        self._queue.put((session_id, [dict(item) for item in items]))
+
+    def _next_batch(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        size = len(first[1])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                # Sinyal berhenti diantrekan ulang agar diproses setelah batch ini
+                self._queue.task_done()
+                self._queue.put(None)
+                break
+            batch.append(entry)
+            size += len(entry[1])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                self._queue.task_done()
+                return
+            # Hanya penulisan berurutan dari sesi yang sama yang digabung, jadi urutan
+            # log tetap sama dengan urutan antrean (pembacaan kronologis mengandalkannya)
+            groups = []
+            for session_id, items in batch:
+                if groups and groups[-1][0] == session_id:
+                    groups[-1][1].extend(items)
+                else:
+                    groups.append((session_id, list(items)))
+            written = sum(len(items) for _, items in groups)
+            try:
+                self.store.append_many(groups)
+                self.written += written
+                self.batches += 1
+            except Exception as e:
+                self.failed += written
+                print(f"Gagal menulis riwayat chat: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    # Fungsi untuk menunggu semua penulisan yang mengantre selesai
+    def flush(self):
+        if not self._closed:
+            self._queue.join()
+
+    def read(self, session_id=None):
+        self.flush()
+        return self.store.read(session_id)
+
+    def read_page(self, session_id=None, limit=CHAT_PAGE_SIZE, before=None):
+        self.flush()
+        return self.store.read_page(session_id, limit, before)
+
+    def iter_messages(self, session_id=None, chunk_size=1000, since=None):
+        self.flush()
+        return self.store.iter_messages(session_id, chunk_size, since)
+
+    def reset(self, session_id=None):
+        self.flush()
+        self.store.reset(session_id)
+
+    # Dipanggil saat proses berhenti: antrean dikosongkan dulu sebelum file ditutup
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._queue.join()
+        self.store.close()
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'batches': self.batches,
+            'failed': self.failed,
+        }
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+
+_retention_started = False
+_retention_lock = threading.Lock()
+
+
+def _enforce_periodically(store, interval, tasks):
+    event = getattr(store, 'retention_event', None)
+    while True:
+        for task in (store.enforce_retention, *tasks):
+            try:
+                task()
+            except Exception as e:
+                print(f"Gagal menjalankan retensi riwayat chat: {e}")
+        if event is not None:
+            event.wait(interval)
+            event.clear()
+        else:
+            time.sleep(interval)
+
+
+# Fungsi untuk menyalakan worker retensi sekali per proses.
+# `tasks` berisi fungsi retensi tambahan (mis. arsip Parquet) yang dijalankan setiap putaran.
+def start_retention_worker(store, interval=RETENTION_INTERVAL, tasks=()):
+    global _retention_started
+    with _retention_lock:
+        if _retention_started:
+            return
+        _retention_started = True
+    threading.Thread(target=_enforce_periodically, args=(store, interval, tuple(tasks)), name="chat-store-retention", daemon=True).start()
+
+
+# Fungsi untuk membuat penyimpanan percakapan sesuai backend dan mode durabilitas yang dipilih
+def create_chat_store(backend=CHAT_STORE_BACKEND, durability=CHAT_DURABILITY):
+    if backend == "sqlite":
+        store = SqliteChatStore()
+    elif backend == "csv":
+        store = CsvChatLog()
+    else:
+        raise ValueError(f"Backend penyimpanan chat tidak dikenal: {backend}")
+    if durability == "async":
+        return WriteBehindStore(store)
+    if durability == "sync":
+        return store
+    raise ValueError(f"Mode durabilitas chat tidak dikenal: {durability}")
+
+
+chat_store = create_chat_store()
@@ -0,0 +1,94 @@
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+
+FIGURE_CACHE_MAX_BYTES = 32 * 1024 * 1024  # total ukuran spesifikasi grafik yang disimpan di memori
+FIGURE_PNG_DPI = 200  # resolusi gambar matplotlib (sama dengan bawaan st.pyplot)
+
+
+# Fungsi untuk membuat fingerprint data grafik (dict, list, angka, string).
+# Kunci diurutkan sehingga data yang sama selalu menghasilkan fingerprint yang sama.
+def data_fingerprint(data):
+    encoded = json.dumps(data, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+
+# Fungsi untuk mengubah figure menjadi spesifikasi siap tampil beserta ukurannya:
+# ('plotly', figure, ukuran JSON) untuk plotly atau ('png', bytes, ukuran) untuk matplotlib.
+# Figure plotly disimpan sebagai objek: st.plotly_chart memvalidasi ulang seluruh isi
+# figure jika diberi dict, sedangkan objek Figure cukup disalin.
+def figure_spec(fig):
+    if hasattr(fig, 'savefig'):
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', dpi=FIGURE_PNG_DPI, bbox_inches='tight')
+        image = buffer.getvalue()
+        return 'png', image, len(image)
+    return 'plotly', fig, len(fig.to_json())
+
+
+# Cache LRU spesifikasi grafik, dipakai bersama semua sesi dan rerun.
+# Kunci berisi id grafik, fingerprint data dan parameter, sehingga grafik hanya
+# dibuat ulang jika datanya berubah. Ukuran dibatasi total byte spesifikasi
+# (PNG, atau JSON untuk figure plotly).
+class FigureCache:
+    def __init__(self, max_bytes=FIGURE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Fungsi untuk mendapatkan (jenis, spesifikasi) grafik; `build()` hanya dipanggil
+    # jika belum ada di cache
+    def get(self, chart_id, data, build, **params):
+        key = (chart_id, data_fingerprint(data), data_fingerprint(params))
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[:2]
+            self.misses += 1
+        entry = figure_spec(build())
+        self.put(key, entry)
+        return entry[:2]
+
+    def put(self, key, entry):
+        size = entry[2]
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            self._data[key] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= evicted[2]
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._data),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+            }
+
+
+figure_cache = FigureCache()
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Error saat antrean inferensi sudah penuh
+class InferenceBusyError(Exception):
+    pass
+
+
+# Pembatas inferensi Rasa: jumlah pemanggilan yang berjalan bersamaan, panjang
+# antrean tunggu, dan tenggat per permintaan. Setiap pemanggilan dijalankan di thread
+# pool berukuran tetap, dan setiap thread worker punya event loop sendiri, sehingga
+# NLU, prediksi policy dan action (yang sebagian sinkron, mis. TensorFlow) dari
+# permintaan berbeda benar-benar berjalan paralel tanpa memblokir loop pemanggil.
+# Tenggat tetap berlaku walaupun worker sedang tertahan di pemanggilan sinkron; slot
+# baru dilepas saat worker benar-benar selesai agar jumlah inferensi tetap terbatas.
+class InferencePool:
+    def __init__(self, max_concurrency=4, max_queue=64, max_workers=4):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_workers = max_workers
+        self._semaphore = None
+        self._executor = None
+        self._local = threading.local()
+        self._loops = []
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    # Semaphore dibuat di dalam event loop pemanggil
+    def _bind(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="rasa-inference")
+
+    # Dijalankan di thread worker: coroutine berjalan di loop milik thread tersebut.
+    # Tenggat juga diterapkan di sini agar coroutine berhenti di titik await berikutnya.
+    def _run_in_worker(self, coroutine_factory, deadline):
+        loop = getattr(self._local, 'loop', None)
+        if loop is None:
+            loop = self._local.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            self._loops.append(loop)
+        return loop.run_until_complete(asyncio.wait_for(coroutine_factory(), deadline))
+
+    def _release(self, future):
+        self.active -= 1
+        self._semaphore.release()
+        # Hasil worker yang tenggatnya sudah habis tetap diambil agar tidak dilaporkan asyncio
+        if not future.cancelled():
+            future.exception()
+
+    # Fungsi untuk menjalankan coroutine dari factory di worker dengan batas antrean dan tenggat
+    async def run(self, coroutine_factory, deadline=None):
+        self._bind()
+        if self.active + self.waiting >= self.max_concurrency + self.max_queue:
+            self.rejected += 1
+            raise InferenceBusyError("Antrean inferensi penuh")
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), deadline)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        remaining = None if deadline is None else max(deadline - (time.monotonic() - started), 0)
+        future = asyncio.get_running_loop().run_in_executor(self._executor, self._run_in_worker, coroutine_factory, remaining)
+        future.add_done_callback(self._release)
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), remaining)
+            self.completed += 1
+            return result
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise
+
+    # Fungsi untuk menghentikan thread worker dan menutup event loop miliknya
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        for loop in self._loops:
+            loop.close()
+        self._loops.clear()
+
+    def stats(self):
+        return {
+            'active': self.active,
+            'waiting': self.waiting,
+            'max_concurrency': self.max_concurrency,
+            'max_queue': self.max_queue,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+        }
@@ -0,0 +1,121 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+from urllib.parse import urlparse
+
+# Layanan inferensi bersama: satu proses memegang model Rasa, beberapa replika
+# Streamlit mengirim pesan lewat Unix socket atau TCP localhost.
+# Protokol: satu objek JSON per baris, misalnya
+#   {"id": 1, "text": "halo", "sender_id": "abc"} -> {"id": 1, "text": "...", "intent": "...", "confidence": 0.9}
+#   {"id": 2, "op": "stats"} -> {"id": 2, "stats": {...}}
+
+DEFAULT_SERVICE_URL = "unix:///tmp/sedulurrasa-inference.sock"
+
+
+# Fungsi untuk mengurai alamat layanan: unix:///path/socket atau tcp://host:port
+def parse_service_url(url):
+    parsed = urlparse(url)
+    if parsed.scheme == "unix":
+        return "unix", parsed.path
+    if parsed.scheme == "tcp":
+        return "tcp", (parsed.hostname or "127.0.0.1", parsed.port or 5056)
+    raise ValueError(f"Alamat layanan inferensi tidak dikenal: {url}")
+
+
+async def _open_connection(url):
+    kind, address = parse_service_url(url)
+    if kind == "unix":
+        return await asyncio.open_unix_connection(address)
+    return await asyncio.open_connection(*address)
+
+
+# Klien layanan inferensi; koneksi dipakai ulang antar permintaan
+class InferenceClient:
+    def __init__(self, url, timeout=35, max_connections=8):
+        self.url = url
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._idle = []
+        self._ids = itertools.count(1)
+
+    async def _request(self, payload):
+        payload = dict(payload, id=next(self._ids))
+        reader, writer = self._idle.pop() if self._idle else await _open_connection(self.url)
+        try:
+            writer.write(json.dumps(payload).encode("utf-8") + b"\n")
+            await writer.drain()
+            line = await asyncio.wait_for(reader.readline(), self.timeout)
+            if not line:
+                raise ConnectionError("Layanan inferensi menutup koneksi")
+        except BaseException:
+            writer.close()
+            raise
+        if len(self._idle) < self.max_connections:
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+        return json.loads(line)
+
+    async def get_reply(self, user_input, sender_id=None):
+        reply = await self._request({"text": user_input, "sender_id": sender_id})
+        return {"text": reply["text"], "intent": reply.get("intent"), "confidence": reply.get("confidence")}
+
+    async def get_response(self, user_input, sender_id=None):
+        reply = await self.get_reply(user_input, sender_id)
+        return reply["text"]
+
+    async def stats(self):
+        reply = await self._request({"op": "stats"})
+        return reply["stats"]
+
+
+async def _handle_connection(reader, writer):
+    from rasa_client import get_local_reply, get_service_stats
+
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            request = json.loads(line)
+            if request.get("op") == "stats":
+                reply = {"id": request.get("id"), "stats": get_service_stats()}
+            else:
+                reply = await get_local_reply(request["text"], request.get("sender_id"))
+                reply["id"] = request.get("id")
+            writer.write(json.dumps(reply).encode("utf-8") + b"\n")
+            await writer.drain()
+    except (ConnectionError, json.JSONDecodeError) as e:
+        print(f"Koneksi layanan inferensi ditutup: {e!r}")
+    finally:
+        writer.close()
+
+
+# Fungsi untuk menjalankan layanan inferensi sampai proses dihentikan
+async def serve(url=DEFAULT_SERVICE_URL):
+    from metrics import start_metrics_exporter
+    from rasa_client import MODEL_RELOAD_INTERVAL, agent_registry
+
+    agent_registry.start()
+    if MODEL_RELOAD_INTERVAL:
+        agent_registry.start_watching(MODEL_RELOAD_INTERVAL)
+    start_metrics_exporter()
+    kind, address = parse_service_url(url)
+    if kind == "unix":
+        if os.path.exists(address):
+            os.remove(address)
+        server = await asyncio.start_unix_server(_handle_connection, address)
+    else:
+        server = await asyncio.start_server(_handle_connection, *address)
+    print(f"Layanan inferensi SedulurRasa berjalan di {url}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Layanan inferensi Rasa bersama untuk replika Streamlit")
+    parser.add_argument("--url", default=DEFAULT_SERVICE_URL, help="unix:///path/socket atau tcp://127.0.0.1:5056")
+    args = parser.parse_args()
+    asyncio.run(serve(args.url))
@@ -3,77 +3,36 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import uuid
-import os
-import asyncio
 import plotly.graph_objects as go
 import plotly.express as px
 from collections import Counter
 from datetime import datetime, timedelta
-from rasa.core.agent import Agent
 from rasa.shared.utils.io import raise_warning
 from rasa.utils.endpoints import EndpointConfig
+from rasa_client import get_rasa_response, run_async, start_agent
+from sentiment import sentiment_counts
+from topics import load_topic_matcher
+from chat_store import chat_store, new_message
+from chat_form import submission_form
 
-# Load Rasa agent
-model_path = "./models"  # Sesuaikan dengan path model Rasa Anda
-agent = Agent.load(model_path)
+# Mulai memuat model Rasa di latar belakang (sekali per proses)
+start_agent()
 
-# Fungsi untuk mendapatkan respons dari Rasa
-async def get_rasa_response(user_input):
-    try:
-        responses = await agent.handle_text(user_input)
-        if responses:
-            for response in responses:
-                if 'text' in response:
-                    return response['text']
-            return "Maaf, saya tidak mengerti. Bisakah Anda menjelaskan lebih lanjut?"
-        else:
-            return "Maaf, saya tidak dapat memproses permintaan Anda saat ini. Bisakah Anda coba lagi?"
-    except Exception as e:
-        print(f"Error in get_rasa_response: {e}")
-        return "Maaf, terjadi kesalahan. Bisakah Anda mencoba lagi?"
-
-# Fungsi untuk menjalankan coroutine dalam Streamlit
-def run_async(coroutine):
-    loop = asyncio.new_event_loop()
-    return loop.run_until_complete(coroutine)
-
-# Fungsi untuk menyimpan riwayat chat
+# Fungsi untuk menyimpan riwayat chat lewat penyimpanan chat bersama (hanya pesan baru yang ditambahkan)
 def save_chat_history(chat_history):
-    df = pd.DataFrame([(item['role'], item['message']) for item in chat_history], columns=['Role', 'Message'])
-    df.to_csv('chat_history.csv', index=False)
+    new_items = [item for item in chat_history if not item.get('saved')]
+    chat_store.append(new_items, st.session_state.get('sender_id'))
+    for item in new_items:
+        item['saved'] = True
 
 # Fungsi untuk memuat riwayat chat
 def load_chat_history():
-    try:
-        df = pd.read_csv('chat_history.csv')
-        return [{'role': row['Role'], 'message': row['Message'], 'id': str(uuid.uuid4())} for _, row in df.iterrows()]
-    except FileNotFoundError:
-        return []
-
-# Fungsi untuk menganalisis sentimen (sederhana)
-def analyze_sentiment(text):
-    positive_words = set(['bahagia', 'senang', 'gembira', 'positif', 'baik'])
-    negative_words = set(['sedih', 'marah', 'kecewa', 'negatif', 'buruk'])
-    
-    words = set(text.lower().split())
-    
-    positive_score = len(words.intersection(positive_words))
-    negative_score = len(words.intersection(negative_words))
-    
-    if positive_score > negative_score:
-        return 'Positif'
-    elif negative_score > positive_score:
-        return 'Negatif'
-    else:
-        return 'Netral'
+    return [dict(item, saved=True) for item in chat_store.read(st.session_state.get('sender_id'))]
 
 # Fungsi untuk membuat grafik analisis sentimen
-def plot_sentiment_analysis(chat_history):
-    sentiments = [analyze_sentiment(item['message']) for item in chat_history if item['role'] == 'User']
-    sentiment_counts = pd.Series(sentiments).value_counts()
-    
+def plot_sentiment_analysis(counts):
     plt.figure(figsize=(10, 6))
-    sns.barplot(x=sentiment_counts.index, y=sentiment_counts.values)
+    sns.barplot(x=counts.index, y=counts.values)
     plt.title('Analisis Sentimen Percakapan')
     plt.xlabel('Sentimen')
     plt.ylabel('Jumlah')
@@ -82,26 +41,22 @@ def plot_sentiment_analysis(chat_history):
 # Fungsi untuk mereset riwayat chat
 def reset_chat_history():
     st.session_state.chat_history = []
-    if os.path.exists('chat_history.csv'):
-        os.remove('chat_history.csv')
+    chat_store.reset(st.session_state.get('sender_id'))
 
 # Fungsi untuk mendapatkan perasaan pengguna
 def get_user_feeling():
-    user_feeling = st.text_input("Bagaimana perasaan Anda hari ini?", key="user_feeling_input")
-    if user_feeling:
-        response = run_async(get_rasa_response(user_feeling))
-        st.session_state.chat_history.append({'role': 'User', 'message': user_feeling, 'id': str(uuid.uuid4())})
-        st.session_state.chat_history.append({'role': 'Bot', 'message': response, 'id': str(uuid.uuid4())})
+    user_feeling = submission_form("feeling", "Bagaimana perasaan Anda hari ini?")
+    if user_feeling is not None:
+        response = run_async(get_rasa_response(user_feeling, st.session_state.sender_id))
+        st.session_state.chat_history.append(new_message('User', user_feeling))
+        st.session_state.chat_history.append(new_message('Bot', response))
         save_chat_history(st.session_state.chat_history)
         st.session_state.conversation_stage = 'random_chat'
         st.experimental_rerun()
         
 # Fungsi untuk membuat diagram pie sentimen
-def plot_sentiment_pie_chart(chat_history):
-    sentiments = [analyze_sentiment(item['message']) for item in chat_history if item['role'] == 'User']
-    sentiment_counts = pd.Series(sentiments).value_counts()
-    
-    fig = go.Figure(data=[go.Pie(labels=sentiment_counts.index, values=sentiment_counts.values)])
+def plot_sentiment_pie_chart(counts):
+    fig = go.Figure(data=[go.Pie(labels=counts.index, values=counts.values)])
     fig.update_layout(title='Analisis Sentimen Percakapan')
     st.plotly_chart(fig)
 
@@ -135,24 +90,9 @@ def plot_usage_line_chart(chat_history):
 
 # Fungsi untuk membuat diagram batang topik
 def plot_topic_bar_chart(chat_history):
-    # Ini adalah fungsi sederhana untuk mengekstrak topik dari pesan
-    # Anda mungkin ingin menggantinya dengan analisis topik yang lebih canggih
-    def extract_topic(message):
-        topics = {
-            'Kecemasan': ['cemas', 'khawatir', 'takut'],
-            'Depresi': ['sedih', 'depresi', 'putus asa'],
-            'Stres': ['stres', 'tertekan', 'overwhelmed'],
-            'Tidur': ['tidur', 'insomnia', 'lelah'],
-            'Relasi': ['hubungan', 'teman', 'keluarga']
-        }
-        for topic, keywords in topics.items():
-            if any(keyword in message.lower() for keyword in keywords):
-                return topic
-        return 'Lainnya'
+    messages = [item['message'] for item in chat_history if item['role'] == 'User']
+    topic_counts = load_topic_matcher().counts(messages)
 
-    topics = [extract_topic(item['message']) for item in chat_history if item['role'] == 'User']
-    topic_counts = Counter(topics)
-    
     df = pd.DataFrame(list(topic_counts.items()), columns=['Topic', 'Count'])
     fig = px.bar(df, x='Topic', y='Count', title='Frekuensi Topik Percakapan')
     st.plotly_chart(fig)
@@ -195,6 +135,8 @@ def main():
     """, unsafe_allow_html=True)
 
     # Initialize session state variables
+    if 'sender_id' not in st.session_state:
+        st.session_state.sender_id = str(uuid.uuid4())
     if 'chat_history' not in st.session_state:
         st.session_state.chat_history = load_chat_history()
     if 'user_name' not in st.session_state:
@@ -220,7 +162,7 @@ def main():
         if name_input:
             st.session_state.user_name = name_input
             greeting_message = f"Halo, {st.session_state.user_name}! Salam kenal, aku Sedulurmu, siap mendengarkan."
-            st.session_state.chat_history.append({'role': 'Bot', 'message': greeting_message, 'id': str(uuid.uuid4())})
+            st.session_state.chat_history.append(new_message('Bot', greeting_message))
             save_chat_history(st.session_state.chat_history)
             st.session_state.conversation_stage = 'ask_feeling'
             st.experimental_rerun()
@@ -229,12 +171,11 @@ def main():
         get_user_feeling()
 
     elif st.session_state.conversation_stage == 'random_chat':
-        user_input = st.text_input("", key="user_input")
-        
-        if user_input:
-            response = run_async(get_rasa_response(user_input))
-            st.session_state.chat_history.append({'role': 'User', 'message': user_input, 'id': str(uuid.uuid4())})
-            st.session_state.chat_history.append({'role': 'Bot', 'message': response, 'id': str(uuid.uuid4())})
+        user_input = submission_form("chat")
+        if user_input is not None:
+            response = run_async(get_rasa_response(user_input, st.session_state.sender_id))
+            st.session_state.chat_history.append(new_message('User', user_input))
+            st.session_state.chat_history.append(new_message('Bot', response))
             save_chat_history(st.session_state.chat_history)
             st.experimental_rerun()
 
@@ -263,8 +204,9 @@ def main():
 
         # Tombol untuk menganalisis sentimen
         if st.button("Analisis Sentimen"):
-            plot_sentiment_analysis(st.session_state.chat_history)
-            plot_sentiment_pie_chart(st.session_state.chat_history)
+            counts = sentiment_counts(st.session_state.chat_history)
+            plot_sentiment_analysis(counts)
+            plot_sentiment_pie_chart(counts)
             plot_usage_line_chart(st.session_state.chat_history)
             plot_topic_bar_chart(st.session_state.chat_history)
 
@@ -0,0 +1,193 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Ekspor metrik (opsional): file teks Prometheus dan/atau endpoint HTTP di localhost
+METRICS_EXPORT_PATH = os.environ.get("SEDULURRASA_METRICS_FILE")
+METRICS_PORT = os.environ.get("SEDULURRASA_METRICS_PORT")
+METRICS_EXPORT_INTERVAL = 15  # detik antar penulisan file metrik
+METRICS_PREFIX = "sedulurrasa"
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+# Fungsi untuk menghitung persentil dari data yang sudah terurut
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(int(q * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def _labels(labels, **extra):
+    labels = {**labels, **extra}
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+# Pencatat latensi per tahap dengan ring buffer berukuran tetap.
+# Menambah sampel hanya berupa deque.append (O(1)); persentil dihitung saat ekspor.
+class Metrics:
+    def __init__(self, window=2048):
+        self.window = window
+        self._samples = {}
+        self._totals = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value):
+        samples = self._samples.get(name)
+        if samples is None:
+            with self._lock:
+                samples = self._samples.setdefault(name, deque(maxlen=self.window))
+                self._totals.setdefault(name, [0, 0.0])
+        samples.append(value)
+        total = self._totals[name]
+        total[0] += 1
+        total[1] += value
+
+    def inc(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    # Fungsi untuk mengukur durasi satu tahap: `with chat_metrics.timer('persist'):`
+    @contextmanager
+    def timer(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(f"stage:{stage}", time.perf_counter() - started)
+
+    def summary(self):
+        result = {}
+        for name, samples in list(self._samples.items()):
+            values = sorted(samples)
+            count, total = self._totals[name]
+            result[name] = {
+                'count': count,
+                'sum': total,
+                'window': len(values),
+                **{f"p{int(q * 100)}": percentile(values, q) for q in QUANTILES},
+            }
+        return result
+
+    def counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+    # Fungsi untuk menghasilkan teks format eksposisi Prometheus
+    def to_prometheus(self):
+        grouped = {}
+        for name, data in sorted(self.summary().items()):
+            if name.startswith("stage:"):
+                metric, labels = f"{METRICS_PREFIX}_stage_duration_seconds", {'stage': name[6:]}
+            else:
+                metric, labels = f"{METRICS_PREFIX}_{name}", {}
+            block = grouped.setdefault(metric, [])
+            for q in QUANTILES:
+                block.append(f"{metric}{_labels(labels, quantile=q)} {data[f'p{int(q * 100)}']:.6f}")
+            block.append(f"{metric}_sum{_labels(labels)} {data['sum']:.6f}")
+            block.append(f"{metric}_count{_labels(labels)} {data['count']}")
+        lines = []
+        for metric, block in grouped.items():
+            lines.append(f"# TYPE {metric} summary")
+            lines.extend(block)
+        for name, value in sorted(self.counters().items()):
+            lines.append(f"# TYPE {METRICS_PREFIX}_{name}_total counter")
+            lines.append(f"{METRICS_PREFIX}_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+
+chat_metrics = Metrics()
+
+
+# Fungsi untuk membungkus metode (sinkron atau async) agar durasinya tercatat
+def _timed(metrics, stage, method):
+    if asyncio.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs):
+            with metrics.timer(stage):
+                return await method(*args, **kwargs)
+    else:
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            with metrics.timer(stage):
+                return method(*args, **kwargs)
+    return wrapper
+
+
+# Fungsi untuk memasang pengukur tahap NLU, prediksi policy dan eksekusi respons
+# pada MessageProcessor milik agent (dipakai sebagai load hook registry)
+def instrument_agent(agent, metrics=chat_metrics):
+    processor = agent.processor
+    original_parse_message = processor.parse_message
+
+    @functools.wraps(original_parse_message)
+    async def parse_message(message, tracker=None, only_output_properties=True):
+        with metrics.timer("nlu"):
+            parse_data = await original_parse_message(message, tracker, only_output_properties)
+        intent = parse_data.get("intent") or {}
+        metrics.observe("intent_confidence", intent.get("confidence") or 0.0)
+        if intent.get("name") == "nlu_fallback":
+            metrics.inc("nlu_fallback")
+        return parse_data
+
+    processor.parse_message = parse_message
+    for stage, attribute in (("policy", "predict_next_with_tracker_if_should"), ("action", "_run_action")):
+        if hasattr(processor, attribute):
+            setattr(processor, attribute, _timed(metrics, stage, getattr(processor, attribute)))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    metrics = chat_metrics
+
+    def do_GET(self):
+        body = self.metrics.to_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_exporter_started = False
+_exporter_lock = threading.Lock()
+
+
+def _write_periodically(metrics, path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            metrics.write_prometheus(path)
+        except OSError as e:
+            print(f"Gagal menulis metrik ke {path}: {e}")
+
+
+# Fungsi untuk menyalakan ekspor metrik sekali per proses
+def start_metrics_exporter(metrics=chat_metrics, path=METRICS_EXPORT_PATH, port=METRICS_PORT):
+    global _exporter_started
+    with _exporter_lock:
+        if _exporter_started:
+            return
+        _exporter_started = True
+    if path:
+        threading.Thread(target=_write_periodically, args=(metrics, path, METRICS_EXPORT_INTERVAL), name="metrics-file-writer", daemon=True).start()
+    if port:
+        handler = type("MetricsHandler", (_MetricsHandler,), {"metrics": metrics})
+        server = ThreadingHTTPServer(("127.0.0.1", int(port)), handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
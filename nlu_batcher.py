@@ -0,0 +1,123 @@
+import asyncio
+import concurrent.futures
+import functools
+import queue
+import threading
+import time
+
+from rasa.engine.constants import PLACEHOLDER_MESSAGE, PLACEHOLDER_TRACKER
+from rasa.shared.nlu.constants import ENTITIES, INTENT, INTENT_NAME_KEY, PREDICTED_CONFIDENCE_KEY, TEXT
+
+
+# Pengumpul pesan untuk inferensi NLU berkelompok.
+# Pesan yang datang dalam jendela waktu singkat dijalankan bersama melalui satu
+# pemanggilan graph NLU (pipeline config.yml), lalu hasilnya dikembalikan ke
+# masing-masing pemanggil. Pemanggil bisa berasal dari event loop mana pun (setiap
+# worker inferensi punya loop sendiri), jadi batch dikumpulkan dan dijalankan oleh
+# satu thread batcher dan hasilnya dikirim lewat concurrent.futures.Future.
+class NLUBatcher:
+    def __init__(self, processor, max_batch_size=16, max_wait=0.01):
+        self.processor = processor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.messages = 0
+
+    @property
+    def average_batch_size(self):
+        return self.messages / self.batches if self.batches else 0.0
+
+    # Thread batcher dinyalakan sekali saat pesan pertama datang
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="rasa-nlu-batcher", daemon=True)
+                self._thread.start()
+
+    # Fungsi untuk mem-parse satu pesan lewat batch berikutnya
+    async def parse(self, message, tracker=None):
+        self._ensure_started()
+        future = concurrent.futures.Future()
+        self._queue.put((message, tracker, future))
+        return await asyncio.wrap_future(future)
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            # Pemanggil yang sudah dibatalkan (mis. tenggat habis) tidak ikut diproses
+            batch = [entry for entry in batch if entry[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            messages = [message for message, _, _ in batch]
+            # Graph hanya menerima satu tracker; pesan tunggal tetap membawa tracker-nya
+            # sehingga hasilnya sama persis dengan jalur tanpa batch
+            tracker = batch[0][1] if len(batch) == 1 else None
+            try:
+                results = self._parse_batch(messages, tracker)
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.messages += len(batch)
+            for (_, _, future), parse_data in zip(batch, results):
+                future.set_result(parse_data)
+
+    # Sama dengan MessageProcessor._parse_message_with_graph ditambah pasca-proses
+    # MessageProcessor.parse_message (nama lengkap intent retrieval ResponseSelector),
+    # tetapi untuk banyak pesan sekaligus
+    def _parse_batch(self, messages, tracker=None):
+        target = self.processor.model_metadata.nlu_target
+        results = self.processor.graph_runner.run(
+            inputs={PLACEHOLDER_MESSAGE: messages, PLACEHOLDER_TRACKER: tracker},
+            targets=[target],
+        )
+        parsed = []
+        for parsed_message in results[target]:
+            parse_data = {
+                TEXT: "",
+                INTENT: {INTENT_NAME_KEY: None, PREDICTED_CONFIDENCE_KEY: 0.0},
+                ENTITIES: [],
+            }
+            parse_data.update(parsed_message.as_dict(only_output_properties=True))
+            self.processor._update_full_retrieval_intent(parse_data)
+            parsed.append(parse_data)
+        return parsed
+
+
+# Fungsi untuk memasang batcher pada MessageProcessor milik agent.
+# Pesan berbentuk "/intent" dan parser HTTP tetap memakai jalur asli Rasa.
+def install_batcher(agent, max_batch_size=16, max_wait=0.01):
+    processor = agent.processor
+    batcher = NLUBatcher(processor, max_batch_size, max_wait)
+    original_parse_message = processor.parse_message
+
+    @functools.wraps(original_parse_message)
+    async def parse_message(message, tracker=None, only_output_properties=True):
+        if (
+            processor.http_interpreter
+            or not only_output_properties
+            or (message.text or "").startswith("/")
+        ):
+            return await original_parse_message(message, tracker, only_output_properties)
+        parse_data = await batcher.parse(message, tracker)
+        processor._check_for_unseen_features(parse_data)
+        return parse_data
+
+    processor.parse_message = parse_message
+    processor.nlu_batcher = batcher
+    return batcher
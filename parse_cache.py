@@ -0,0 +1,123 @@
+import copy
+import functools
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from agent_registry import agent_fingerprint
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+# Fungsi untuk menormalkan teks pesan sebelum dijadikan kunci cache
+def normalize_text(text):
+    return _WHITESPACE.sub(" ", (text or "").strip()).casefold()
+
+
+# Cache LRU untuk hasil parse NLU (intent, entitas, confidence).
+# Kunci berisi fingerprint model, sehingga hasil model lama tidak pernah terpakai
+# setelah model baru dimuat dari ./models.
+class ParseCache:
+    def __init__(self, max_size=10000, ttl=3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.fingerprint = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # Fungsi untuk mengosongkan cache saat model berganti
+    def set_fingerprint(self, fingerprint):
+        with self._lock:
+            if fingerprint != self.fingerprint:
+                self._data.clear()
+                self.fingerprint = fingerprint
+                self.invalidations += 1
+
+    # Hasil untuk agent dengan fingerprint lain (mis. agent lama saat hot reload) diabaikan
+    def get(self, text, fingerprint=None):
+        with self._lock:
+            if fingerprint is not None and fingerprint != self.fingerprint:
+                self.misses += 1
+                return None
+            key = (self.fingerprint, normalize_text(text))
+            entry = self._data.get(key)
+            if entry is not None:
+                stored_at, original_text, parse_data = entry
+                expired = self.ttl and time.monotonic() - stored_at > self.ttl
+                # Posisi entitas mengacu pada teks asli, jadi hanya dipakai ulang untuk teks yang sama persis
+                offsets_differ = parse_data.get('entities') and original_text != text
+                if not expired and not offsets_differ:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    result = copy.deepcopy(parse_data)
+                    result['text'] = text
+                    return result
+                if expired:
+                    del self._data[key]
+                    self.evictions += 1
+            self.misses += 1
+            return None
+
+    # Fungsi untuk melihat hasil parse tanpa mengubah urutan LRU maupun statistik
+    def peek(self, text, fingerprint=None):
+        with self._lock:
+            if fingerprint is not None and fingerprint != self.fingerprint:
+                return None
+            entry = self._data.get((self.fingerprint, normalize_text(text)))
+            return copy.deepcopy(entry[2]) if entry is not None else None
+
+    def put(self, text, parse_data, fingerprint=None):
+        with self._lock:
+            if fingerprint is not None and fingerprint != self.fingerprint:
+                return
+            key = (self.fingerprint, normalize_text(text))
+            self._data[key] = (time.monotonic(), text, copy.deepcopy(parse_data))
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._data),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'fingerprint': self.fingerprint,
+            }
+
+
+# Fungsi untuk memasang cache di depan parse_message milik agent
+def install_parse_cache(agent, cache):
+    processor = agent.processor
+    fingerprint = agent_fingerprint(agent)
+    cache.set_fingerprint(fingerprint)
+    original_parse_message = processor.parse_message
+
+    @functools.wraps(original_parse_message)
+    async def parse_message(message, tracker=None, only_output_properties=True):
+        if not only_output_properties or (message.text or "").startswith("/"):
+            return await original_parse_message(message, tracker, only_output_properties)
+        parse_data = cache.get(message.text, fingerprint)
+        if parse_data is None:
+            parse_data = await original_parse_message(message, tracker, only_output_properties)
+            cache.put(message.text, parse_data, fingerprint)
+        return parse_data
+
+    processor.parse_message = parse_message
+    processor.parse_cache = cache
+    return cache
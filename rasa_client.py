@@ -0,0 +1,168 @@
+import asyncio
+import os
+from agent_registry import get_registry
+from async_runner import get_background_loop
+from inference_pool import InferenceBusyError, InferencePool
+from inference_service import InferenceClient
+from metrics import chat_metrics, instrument_agent
+from parse_cache import ParseCache, install_parse_cache
+
+# Load Rasa agent (sekali per proses, dipakai bersama oleh semua sesi dan rerun)
+model_path = "./models"  # Sesuaikan dengan path model Rasa Anda
+AGENT_POLL_INTERVAL = 0.1  # detik antar pemeriksaan kesiapan model yang masih dimuat
+RESPONSE_TIMEOUT = 30  # detik maksimum untuk satu respons Rasa (termasuk antre)
+INFERENCE_MAX_CONCURRENCY = 4  # jumlah pemanggilan Rasa yang berjalan bersamaan
+INFERENCE_MAX_QUEUE = 64  # jumlah permintaan yang boleh menunggu sebelum ditolak
+INFERENCE_MAX_WORKERS = 4  # jumlah thread untuk graph NLU/TensorFlow
+TRACKER_STORE_MAX_SIZE = 5000  # jumlah percakapan aktif yang disimpan di memori
+DEFAULT_SENDER_ID = "default"
+NLU_BATCH_MAX_SIZE = 16  # jumlah pesan maksimum dalam satu batch NLU
+NLU_BATCH_MAX_WAIT = 0.01  # detik menunggu pesan lain sebelum batch dijalankan
+PARSE_CACHE_MAX_SIZE = 10000  # jumlah hasil parse NLU yang disimpan
+PARSE_CACHE_TTL = 3600  # detik sebelum hasil parse di-cache dianggap usang
+# Jika diisi (mis. unix:///tmp/sedulurrasa-inference.sock atau tcp://127.0.0.1:5056),
+# respons diambil dari layanan inferensi bersama dan model tidak dimuat di proses ini
+INFERENCE_SERVICE_URL = os.environ.get("SEDULURRASA_INFERENCE_URL")
+WARMUP_EXAMPLES_PER_INTENT = 2  # contoh per intent dari data/nlu.yml untuk warm-up (0 = mati)
+MODEL_RELOAD_INTERVAL = 30  # detik antar pemeriksaan arsip model baru di ./models (0 = mati)
+
+# Fungsi untuk membuat tracker store terbatas (diimpor saat model dimuat)
+def create_tracker_store():
+    from tracker_store import BoundedInMemoryTrackerStore
+    return BoundedInMemoryTrackerStore(max_size=TRACKER_STORE_MAX_SIZE)
+
+# Fungsi untuk memasang inferensi NLU berkelompok pada agent yang baru dimuat
+def install_nlu_batcher(agent):
+    from nlu_batcher import install_batcher
+    install_batcher(agent, NLU_BATCH_MAX_SIZE, NLU_BATCH_MAX_WAIT)
+
+# Fungsi untuk memanaskan model sebelum agent ditandai siap
+def warm_up_agent(agent):
+    if WARMUP_EXAMPLES_PER_INTENT:
+        from warmup import run_warm_up
+        run_warm_up(agent, WARMUP_EXAMPLES_PER_INTENT)
+
+# Cache hasil parse NLU, dipakai bersama semua sesi dan dikosongkan saat model berganti
+parse_cache = ParseCache(PARSE_CACHE_MAX_SIZE, PARSE_CACHE_TTL)
+
+# Fungsi untuk memasang cache parse di depan pipeline NLU
+def install_nlu_parse_cache(agent):
+    install_parse_cache(agent, parse_cache)
+
+agent_registry = get_registry(model_path, create_tracker_store)
+agent_registry.add_load_hook(install_nlu_batcher)
+# Warm-up sebelum cache dipasang agar latensi hangat mengukur model, bukan cache
+agent_registry.add_load_hook(warm_up_agent)
+agent_registry.add_load_hook(install_nlu_parse_cache)
+agent_registry.add_load_hook(instrument_agent)
+background_loop = get_background_loop()
+inference_pool = InferencePool(INFERENCE_MAX_CONCURRENCY, INFERENCE_MAX_QUEUE, INFERENCE_MAX_WORKERS)
+inference_client = InferenceClient(INFERENCE_SERVICE_URL, RESPONSE_TIMEOUT + 5) if INFERENCE_SERVICE_URL else None
+
+# Fungsi untuk mulai memuat model di proses ini (tidak perlu dalam mode klien)
+def start_agent():
+    if inference_client is None:
+        agent_registry.start()
+        if MODEL_RELOAD_INTERVAL:
+            agent_registry.start_watching(MODEL_RELOAD_INTERVAL)
+
+# Fungsi untuk mendapatkan balasan Rasa beserta intent dan confidence pesan pengguna
+async def get_rasa_reply(user_input, sender_id=None):
+    with chat_metrics.timer("rasa"):
+        if inference_client is None:
+            return await get_local_reply(user_input, sender_id)
+        try:
+            return await inference_client.get_reply(user_input, sender_id)
+        except Exception as e:
+            print(f"Error in get_rasa_response (layanan inferensi): {e!r}")
+            chat_metrics.inc("error")
+            return {'text': "Maaf, terjadi kesalahan. Bisakah Anda mencoba lagi?", 'intent': None, 'confidence': None}
+
+# Fungsi untuk mendapatkan respons dari Rasa (lokal atau lewat layanan inferensi)
+async def get_rasa_response(user_input, sender_id=None):
+    reply = await get_rasa_reply(user_input, sender_id)
+    return reply['text']
+
+# Fungsi untuk mendapatkan intent dan confidence hasil NLU terakhir untuk sebuah pesan.
+# Hasil parse diambil dari cache parse (tanpa menjalankan NLU lagi); None jika tidak ada.
+def get_message_intent(user_input):
+    parse_data = parse_cache.peek(user_input, agent_registry.fingerprint) if agent_registry.is_ready else None
+    intent = (parse_data or {}).get('intent') or {}
+    return {'intent': intent.get('name'), 'confidence': intent.get('confidence')}
+
+# Fungsi untuk mendapatkan balasan dari agent Rasa milik proses ini beserta intent pesan
+async def get_local_reply(user_input, sender_id=None):
+    text = await get_local_response(user_input, sender_id)
+    return {'text': text, **get_message_intent(user_input)}
+
+# Fungsi untuk menunggu agent siap tanpa memakai thread; None jika pemuatan gagal
+async def wait_for_agent():
+    while True:
+        agent = agent_registry.get_agent(timeout=0)
+        if agent is not None or agent_registry.is_failed:
+            return agent
+        await asyncio.sleep(AGENT_POLL_INTERVAL)
+
+# Fungsi untuk menjalankan satu pesan pada agent; None jika agent tidak tersedia
+async def handle_text(user_input, sender_id=None):
+    agent = await wait_for_agent()
+    if agent is None:
+        return None
+    return await agent.handle_text(user_input, sender_id=sender_id or DEFAULT_SENDER_ID)
+
+# Fungsi untuk mendapatkan respons dari agent Rasa milik proses ini.
+# Menunggu model selesai dimuat terjadi di dalam antrean inferensi, jadi saat cold
+# start atau warm-up permintaan tetap dibatasi panjang antrean dan RESPONSE_TIMEOUT.
+async def get_local_response(user_input, sender_id=None):
+    try:
+        responses = await inference_pool.run(lambda: handle_text(user_input, sender_id), RESPONSE_TIMEOUT)
+        if responses is None:
+            chat_metrics.inc("unavailable")
+            return "Maaf, saya tidak dapat memproses permintaan Anda saat ini. Bisakah Anda coba lagi?"
+        if responses:
+            for response in responses:
+                if 'text' in response:
+                    return response['text']
+            chat_metrics.inc("fallback")
+            return "Maaf, saya tidak mengerti. Bisakah Anda menjelaskan lebih lanjut?"
+        else:
+            chat_metrics.inc("fallback")
+            return "Maaf, saya tidak dapat memproses permintaan Anda saat ini. Bisakah Anda coba lagi?"
+    except (InferenceBusyError, asyncio.TimeoutError) as e:
+        print(f"Rasa sedang sibuk, permintaan tidak diproses: {e!r}")
+        chat_metrics.inc("busy")
+        return "Maaf, saya tidak dapat memproses permintaan Anda saat ini. Bisakah Anda coba lagi?"
+    except Exception as e:
+        print(f"Error in get_rasa_response: {e}")
+        chat_metrics.inc("error")
+        return "Maaf, terjadi kesalahan. Bisakah Anda mencoba lagi?"
+
+# Fungsi untuk menjalankan coroutine dalam Streamlit lewat event loop latar belakang
+def run_async(coroutine, timeout=None):
+    return background_loop.run(coroutine, timeout)
+
+# Fungsi untuk melihat statistik tracker store (jumlah, memori, eviksi)
+def get_tracker_store_stats():
+    tracker_store = agent_registry.tracker_store if agent_registry.is_ready else None
+    if tracker_store is None or not hasattr(tracker_store, 'stats'):
+        return {}
+    return tracker_store.stats()
+
+# Fungsi untuk melihat statistik cache parse NLU
+def get_parse_cache_stats():
+    return parse_cache.stats()
+
+# Fungsi untuk melihat statistik antrean inferensi
+def get_inference_pool_stats():
+    return inference_pool.stats()
+
+# Fungsi untuk mengumpulkan semua statistik inferensi proses ini
+def get_service_stats():
+    return {
+        'model': agent_registry.info(),
+        'tracker_store': get_tracker_store_stats(),
+        'parse_cache': get_parse_cache_stats(),
+        'inference_pool': get_inference_pool_stats(),
+        'latency': chat_metrics.summary(),
+        'counters': chat_metrics.counters(),
+    }
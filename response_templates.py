@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+
+import yaml
+
+DOMAIN_PATH = 'domain.yml'
+# Semua versi teks respons yang pernah dipakai; referensi lama tetap bisa dibaca
+# walaupun teksnya di domain.yml sudah diubah atau dihapus
+TEMPLATE_TABLE_PATH = 'response_templates.json'
+
+_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+
+# Fungsi untuk membuat referensi template yang stabil: nama respons + hash teksnya
+def template_ref(name, text):
+    return f"{name}@{hashlib.sha1(text.encode('utf-8')).hexdigest()[:8]}"
+
+
+# Fungsi untuk membuat regex yang mengenali teks hasil template ber-placeholder {slot}
+def _template_pattern(text):
+    parts, names, pos = [], set(), 0
+    for match in _PLACEHOLDER.finditer(text):
+        parts.append(re.escape(text[pos:match.start()]))
+        name = match.group(1)
+        parts.append(f"(?P={name})" if name in names else f"(?P<{name}>.+?)")
+        names.add(name)
+        pos = match.end()
+    parts.append(re.escape(text[pos:]))
+    return re.compile(''.join(parts), re.DOTALL)
+
+
+# Fungsi untuk mengisi placeholder {slot} pada teks template dengan variabel
+def fill_template(text, variables=None):
+    if not variables:
+        return text
+    return _PLACEHOLDER.sub(lambda m: str(variables.get(m.group(1), m.group(0))), text)
+
+
+# Tabel template respons bot dari domain.yml.
+# Balasan bot yang sama persis dengan teks respons disimpan sebagai referensi
+# (plus variabel untuk placeholder) tanpa teks lengkapnya. Tabel ini dipakai untuk
+# mengenali teks balasan; teks setiap referensi yang ditulis juga dicatat di tabel
+# template milik penyimpanan chat, sehingga riwayat tetap terbaca tanpa file ini.
+class TemplateTable:
+    def __init__(self, domain_path=DOMAIN_PATH, table_path=TEMPLATE_TABLE_PATH):
+        self.domain_path = domain_path
+        self.table_path = table_path
+        self._texts = {}
+        self._exact = {}
+        self._patterns = []
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _add(self, ref, text):
+        text = sys.intern(text)
+        self._texts[ref] = text
+        if _PLACEHOLDER.search(text):
+            self._patterns.append((_template_pattern(text), ref))
+        else:
+            self._exact.setdefault(text, ref)
+
+    # Dimuat sekali saat pertama dipakai; template baru dari domain.yml ditambahkan ke tabel
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            table = {}
+            if os.path.exists(self.table_path):
+                with open(self.table_path, encoding='utf-8') as f:
+                    table = json.load(f)
+            current = {}
+            if os.path.exists(self.domain_path):
+                with open(self.domain_path, encoding='utf-8') as f:
+                    domain = yaml.safe_load(f) or {}
+                for name, variations in (domain.get('responses') or {}).items():
+                    for variation in variations or []:
+                        text = (variation or {}).get('text')
+                        if text:
+                            current[template_ref(name, text)] = text
+            # Template di domain.yml didahulukan saat mencocokkan teks balasan
+            for ref, text in current.items():
+                self._add(ref, text)
+            for ref, text in table.items():
+                if ref not in current:
+                    self._add(ref, text)
+            if not set(current) <= set(table):
+                self._save({**table, **current})
+            self._loaded = True
+
+    def _save(self, table):
+        tmp_path = f"{self.table_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(table, f, ensure_ascii=False, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.table_path)
+        except OSError as e:
+            print(f"Gagal menyimpan tabel template respons ke {self.table_path}: {e}")
+
+    # Fungsi untuk mengubah teks balasan menjadi (referensi, variabel) atau (None, None)
+    def encode(self, text):
+        self._ensure_loaded()
+        ref = self._exact.get(text)
+        if ref is not None:
+            return ref, {}
+        for pattern, ref in self._patterns:
+            match = pattern.fullmatch(text)
+            if match:
+                return ref, match.groupdict()
+        return None, None
+
+    # Fungsi untuk mengembalikan teks dari referensi dan variabel; None jika referensi tidak dikenal
+    def render(self, ref, variables=None):
+        self._ensure_loaded()
+        text = self._texts.get(ref)
+        return text if text is None else fill_template(text, variables)
+
+    def stats(self):
+        self._ensure_loaded()
+        return {'templates': len(self._texts), 'with_variables': len(self._patterns)}
+
+
+template_table = TemplateTable()
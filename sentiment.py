@@ -0,0 +1,85 @@
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+import yaml
+
+# Leksikon sentimen (bukan di data/ karena folder itu dibaca Rasa saat training)
+SENTIMENT_LEXICON_PATH = 'lexicons/sentiment.yml'
+SENTIMENT_LABELS = ['Positif', 'Netral', 'Negatif']
+_TOKEN = r"\w+"
+
+
+# Leksikon yang sudah dikompilasi: kata tunggal -> polaritas (+1/-1) untuk lookup
+# token, dan frasa beberapa kata sebagai regex
+class SentimentLexicon:
+    def __init__(self, positive, negative):
+        self.polarity = {}
+        self.phrases = []
+        for terms, polarity in ((positive, 1), (negative, -1)):
+            for term in terms:
+                term = term.strip().lower()
+                if not term:
+                    continue
+                if ' ' in term:
+                    words = (re.escape(word) for word in term.split())
+                    self.phrases.append((re.compile(r"\b" + r"\s+".join(words) + r"\b"), polarity))
+                else:
+                    self.polarity[term] = polarity
+
+    def __len__(self):
+        return len(self.polarity) + len(self.phrases)
+
+
+_lexicons = {}
+_lexicons_lock = threading.Lock()
+
+
+# Fungsi untuk memuat leksikon dari file YAML (sekali per proses untuk setiap path)
+def load_lexicon(path=SENTIMENT_LEXICON_PATH):
+    with _lexicons_lock:
+        lexicon = _lexicons.get(path)
+        if lexicon is None:
+            with open(path, encoding='utf-8') as f:
+                data = yaml.safe_load(f) or {}
+            lexicon = SentimentLexicon(data.get('positive') or [], data.get('negative') or [])
+            _lexicons[path] = lexicon
+        return lexicon
+
+
+# Fungsi untuk menghitung skor sentimen banyak pesan sekaligus.
+# Skor = jumlah istilah positif berbeda dikurangi istilah negatif berbeda dalam pesan.
+def score_messages(messages, lexicon=None):
+    lexicon = lexicon or load_lexicon()
+    texts = pd.Series(messages, dtype=object).fillna('').astype(str).str.lower().reset_index(drop=True)
+    scores = pd.Series(0, index=texts.index, dtype='int64')
+    words = texts.str.findall(_TOKEN).explode().dropna()
+    if len(words):
+        # Hanya token yang ada di leksikon yang diproses lebih lanjut; istilah berulang dihitung sekali
+        words = words[words.isin(lexicon.polarity.keys())]
+        hits = pd.DataFrame({'row': words.index, 'word': words.values}).drop_duplicates()
+        hits['polarity'] = hits['word'].map(lexicon.polarity)
+        scores = scores.add(hits.groupby('row')['polarity'].sum(), fill_value=0).astype('int64')
+    for pattern, polarity in lexicon.phrases:
+        scores += texts.str.contains(pattern).astype('int64') * polarity
+    return scores
+
+
+# Fungsi untuk mengubah skor menjadi label Positif/Netral/Negatif
+def classify(scores):
+    labels = np.select([scores > 0, scores < 0], ['Positif', 'Negatif'], default='Netral')
+    return pd.Series(labels, index=scores.index)
+
+
+# Fungsi untuk menganalisis sentimen satu teks
+def analyze_sentiment(text):
+    return classify(score_messages([text])).iloc[0]
+
+
+# Fungsi untuk menghitung jumlah pesan pengguna per sentimen dalam satu kali proses;
+# hasilnya dipakai bersama oleh semua grafik sentimen
+def sentiment_counts(chat_history):
+    messages = [item['message'] for item in chat_history if item['role'] == 'User']
+    counts = classify(score_messages(messages)).value_counts().reindex(SENTIMENT_LABELS, fill_value=0)
+    return counts[counts > 0]
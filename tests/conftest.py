@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Modul aplikasi berada di root repositori (bukan paket), jadi root ditambahkan ke sys.path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
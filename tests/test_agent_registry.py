@@ -0,0 +1,38 @@
+import os
+
+from agent_registry import AgentRegistry
+
+
+class _FailSafe:
+    def __init__(self, tracker_store):
+        self._tracker_store = tracker_store
+
+
+class _Agent:
+    def __init__(self, tracker_store):
+        # Seperti Agent Rasa 3.x: store yang diberikan selalu dibungkus
+        self.tracker_store = _FailSafe(tracker_store)
+
+
+def test_reload_reuses_the_unwrapped_tracker_store(tmp_path, monkeypatch):
+    store = object()
+    registry = AgentRegistry(str(tmp_path), tracker_store_factory=lambda: store)
+    built_with = []
+
+    def build_agent(model_file, tracker_store):
+        built_with.append(tracker_store)
+        return _Agent(tracker_store)
+
+    monkeypatch.setattr(registry, '_build_agent', build_agent)
+    (tmp_path / 'model-1.tar.gz').write_bytes(b'')
+    os.utime(tmp_path / 'model-1.tar.gz', (1000, 1000))
+    registry.load()
+    for n in (2, 3):
+        model = tmp_path / f'model-{n}.tar.gz'
+        model.write_bytes(b'')
+        os.utime(model, (n * 1000, n * 1000))
+        assert registry.reload()
+
+    assert built_with == [store, store, store]
+    assert registry.tracker_store is store
+    assert registry.reloads == 2
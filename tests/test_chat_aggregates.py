@@ -0,0 +1,120 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import chat_aggregates
+from chat_aggregates import ConversationAggregates, usage_series
+from chat_store import CsvChatLog, new_message
+
+
+def _message_at(timestamp, text='halo'):
+    return dict(new_message('User', text), timestamp=timestamp)
+
+
+# Penulisan pesan hanya menandai sesi; file ditulis oleh save() untuk sesi yang berubah saja
+def test_save_writes_only_changed_sessions(tmp_path):
+    path = str(tmp_path / 'chat_aggregates')
+    aggregates = ConversationAggregates(path)
+    aggregates.add([('A', [_message_at('2026-10-10 09:00:00')]), ('B', [_message_at('2026-10-10 09:00:00')])])
+    assert not os.path.exists(path)
+
+    aggregates.save()
+    assert len(os.listdir(path)) == 2
+    b_path = aggregates._session_path('B')
+    b_written = os.stat(b_path).st_mtime_ns
+    os.utime(b_path, ns=(b_written - 10**9, b_written - 10**9))
+
+    aggregates.add([('A', [_message_at('2026-10-10 10:00:00')])])
+    aggregates.save()
+    assert os.stat(b_path).st_mtime_ns == b_written - 10**9
+
+    reloaded = ConversationAggregates(path)
+    assert reloaded.is_loaded
+    assert reloaded.summary('A')['messages'] == 2
+    assert reloaded.summary()['messages'] == 3
+
+
+def test_reset_removes_session_file(tmp_path):
+    aggregates = ConversationAggregates(str(tmp_path / 'chat_aggregates'))
+    aggregates.add([('A', [_message_at('2026-10-10 09:00:00')]), ('B', [_message_at('2026-10-10 09:00:00')])])
+    aggregates.save()
+    aggregates.on_reset('A')
+    assert not os.path.exists(aggregates._session_path('A'))
+    assert os.path.exists(aggregates._session_path('B'))
+
+
+def test_retention_prunes_expired_usage_and_sessions(tmp_path):
+    aggregates = ConversationAggregates(str(tmp_path / 'chat_aggregates'))
+    aggregates.add([
+        ('lama', [_message_at('2025-01-01 09:00:00')]),
+        ('campur', [_message_at('2025-01-01 09:00:00'), _message_at('2025-07-02 09:00:00')]),
+    ])
+    aggregates.save()
+
+    result = aggregates.enforce_retention(2, now=datetime(2025, 7, 3, 12))
+    aggregates.save()
+    assert result == {'removed': 1}
+    assert aggregates.summary('lama')['messages'] == 0
+    assert not os.path.exists(aggregates._session_path('lama'))
+    assert dict(aggregates.summary('campur')['usage']) == {'2025-07-02 09:00': 1}
+
+
+def test_rebuild_from_store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = CsvChatLog(str(tmp_path / 'chat_history.csv'), fsync_policy='none')
+    try:
+        store.append([_message_at('2026-10-10 09:00:00'), _message_at('2026-10-10 09:30:00')], 'A')
+        aggregates = ConversationAggregates(str(tmp_path / 'chat_aggregates'))
+        assert not aggregates.is_loaded
+        aggregates.rebuild(store)
+        assert ConversationAggregates(str(tmp_path / 'chat_aggregates')).summary('A')['usage'] == {'2026-10-10 09:00': 2}
+    finally:
+        store.close()
+
+
+USAGE = {'2026-03-07 04:00': 1, '2026-03-08 06:00': 2, '2026-03-08 07:00': 1, '2026-03-09 04:00': 3, '2026-03-11 10:00': 1}
+
+
+# Periode tanpa pesan tetap muncul dengan nilai 0
+@pytest.mark.parametrize('granularity, expected', [
+    ('hour', {'2026-10-11 23:00': 1, '2026-10-12 00:00': 0, '2026-10-12 01:00': 0, '2026-10-12 02:00': 4}),
+    ('day', {'2026-10-09 00:00': 2, '2026-10-10 00:00': 0, '2026-10-11 00:00': 1, '2026-10-12 00:00': 4}),
+    ('week', {'2026-10-05 00:00': 3, '2026-10-12 00:00': 4}),
+])
+def test_usage_series_resamples_and_fills_gaps(granularity, expected):
+    usage = {'2026-10-11 23:00': 1, '2026-10-12 02:00': 4}
+    if granularity != 'hour':
+        usage['2026-10-09 09:00'] = 2
+    series = usage_series(usage, granularity, tz=None)
+    assert {index.strftime('%Y-%m-%d %H:%M'): value for index, value in series.items()} == expected
+
+
+def test_usage_series_ignores_invalid_buckets_and_rejects_unknown_granularity():
+    assert usage_series({}, 'day').empty
+    assert usage_series({'bukan waktu': 5, '2026-10-10 09:00': 1}, 'day', tz=None).to_dict() == {pd.Timestamp('2026-10-10'): 1}
+    with pytest.raises(ValueError):
+        usage_series({'2026-10-10 09:00': 1}, 'month')
+
+
+# Offset zona server diambil per timestamp, sehingga data di kedua sisi pergantian DST benar
+def test_usage_series_converts_timezone_across_dst():
+    series = usage_series(USAGE, 'day', tz='America/New_York', server_tz='UTC')
+    assert [str(index) for index in series.index] == [
+        '2026-03-06 00:00:00-05:00', '2026-03-07 00:00:00-05:00', '2026-03-08 00:00:00-05:00',
+        '2026-03-09 00:00:00-04:00', '2026-03-10 00:00:00-04:00', '2026-03-11 00:00:00-04:00',
+    ]
+    assert list(series) == [1, 0, 3, 3, 0, 1]
+
+    fall_back = usage_series({'2026-11-01 01:00': 2, '2026-11-01 02:00': 1}, 'hour', tz='UTC', server_tz='America/New_York')
+    assert {str(index): value for index, value in fall_back.items()} == {
+        '2026-11-01 05:00:00+00:00': 2, '2026-11-01 06:00:00+00:00': 0, '2026-11-01 07:00:00+00:00': 1,
+    }
+
+
+def test_usage_series_uses_configured_server_timezone(monkeypatch):
+    monkeypatch.setattr(chat_aggregates, 'SERVER_TIMEZONE', 'Asia/Jakarta')
+    assert chat_aggregates.server_timezone() == 'Asia/Jakarta'
+    series = usage_series({'2026-10-10 06:00': 1}, 'hour', tz='UTC')
+    assert str(series.index[0]) == '2026-10-09 23:00:00+00:00'
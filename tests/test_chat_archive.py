@@ -0,0 +1,76 @@
+import os
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from chat_archive import archived_days, enforce_archive_retention, export_closed_days  # noqa: E402
+from chat_store import CsvChatLog, new_message  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = CsvChatLog(str(tmp_path / 'chat_history.csv'), fsync_policy='none')
+    yield store
+    store.close()
+
+
+def test_retention_drops_old_partitions(store, tmp_path):
+    archive = str(tmp_path / 'chat_archive')
+    for day in ('2025-01-01', '2025-06-30', '2025-07-01', '2025-07-02'):
+        store.append([dict(new_message('User', day), timestamp=f"{day} 09:00:00")], 'A')
+    assert export_closed_days(store, archive, today='2025-07-03') == ['2025-01-01', '2025-06-30', '2025-07-01', '2025-07-02']
+
+    result = enforce_archive_retention(2, archive, today='2025-07-03')
+    assert result == {'removed': 2}
+    assert archived_days(archive) == {'2025-07-01', '2025-07-02'}
+    assert not os.path.exists(os.path.join(archive, 'date=2025-01-01'))
+
+
+def test_expired_days_are_not_exported(store, tmp_path):
+    archive = str(tmp_path / 'chat_archive')
+    for day in ('2025-06-01', '2025-07-02'):
+        store.append([dict(new_message('User', day), timestamp=f"{day} 09:00:00")], 'A')
+    assert export_closed_days(store, archive, today='2025-07-03', retention_days=2) == ['2025-07-02']
+
+
+def test_retention_disabled_keeps_everything(store, tmp_path):
+    archive = str(tmp_path / 'chat_archive')
+    store.append([dict(new_message('User', 'lama'), timestamp="2020-01-01 09:00:00")], 'A')
+    export_closed_days(store, archive, today='2025-07-03', retention_days=0)
+    assert enforce_archive_retention(0, archive) == {'removed': 0}
+    assert archived_days(archive) == {'2020-01-01'}
+
+
+def test_analytics_reads_archive_then_unarchived_days(store, tmp_path):
+    from chat_archive import iter_analytics_messages
+
+    archive = str(tmp_path / 'chat_archive')
+    for day in ('2025-07-01', '2025-07-02', '2025-07-03'):
+        store.append([dict(new_message('User', day), timestamp=f"{day} 09:00:00")], 'A')
+    export_closed_days(store, archive, today='2025-07-03', retention_days=0)
+
+    chunks = list(iter_analytics_messages(store, ['message', 'timestamp'], archive))
+    items = [item for chunk in chunks for item in chunk]
+    assert sorted(item['message'] for item in items) == ['2025-07-01', '2025-07-02', '2025-07-03']
+    assert all(set(item) == {'message', 'timestamp'} for item in items)
+
+
+# Ekspor berikutnya hanya membaca segmen yang lebih baru dari hari terakhir di arsip
+def test_export_skips_segments_older_than_archive(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    archive = str(tmp_path / 'chat_archive')
+    log = CsvChatLog(str(tmp_path / 'chat_history.csv'), fsync_policy='none', max_bytes=1)
+    try:
+        log.append([dict(new_message('User', 'lama'), timestamp="2025-07-01 09:00:00")], 'A')
+        assert export_closed_days(log, archive, today='2025-07-02', retention_days=0) == ['2025-07-01']
+        opened = []
+        open_segment = log._open_segment
+        monkeypatch.setattr(log, '_open_segment', lambda stem: opened.append(stem) or open_segment(stem))
+        monkeypatch.setattr('chat_store._segment_time', lambda stem: datetime(2025, 7, 1, 9).timestamp())
+        assert export_closed_days(log, archive, today='2025-07-03', retention_days=0) == []
+        assert opened == []
+    finally:
+        log.close()
@@ -0,0 +1,37 @@
+import gzip
+import os
+
+import pytest
+
+from chat_export import discard_export, export_file
+from chat_store import CsvChatLog, new_message
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = CsvChatLog(str(tmp_path / 'chat_history.csv'), fsync_policy='none')
+    store.append([new_message('User', 'halo'), new_message('Bot', 'hai juga')], 'A')
+    store.append([new_message('User', 'rahasia sesi lain')], 'B')
+    yield store
+    store.close()
+
+
+def test_export_file_is_written_to_disk_and_discarded(store, tmp_path):
+    directory = str(tmp_path / 'exports')
+    path = export_file(store, 'jsonl', 'A', directory=directory)
+    with open(path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 2
+    assert 'rahasia' not in ''.join(lines)
+    discard_export(path)
+    assert not os.path.exists(path)
+
+
+def test_compressed_csv_export(store, tmp_path):
+    path = export_file(store, 'csv', 'A', compress=True, directory=str(tmp_path / 'exports'))
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        rows = f.read().splitlines()
+    assert rows[0].startswith('Role,Message')
+    assert len(rows) == 3
+    assert path.endswith('.csv.gz')
@@ -0,0 +1,38 @@
+import pytest
+
+pytest.importorskip('streamlit.testing.v1')
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+
+def _app():
+    import streamlit as st
+
+    from chat_form import submission_form
+
+    if 'received' not in st.session_state:
+        st.session_state.received = []
+    text = submission_form("chat")
+    if text is not None:
+        st.session_state.received.append(text)
+
+
+# Rerun setelah pengiriman tidak boleh mengirim ulang pesan yang sama
+def test_submission_is_accepted_once_per_submit():
+    at = AppTest.from_function(_app).run()
+    at.text_input[0].input("halo")
+    at.button[0].click().run()
+    at.run()
+    at.run()
+    assert at.session_state.received == ['halo']
+
+    at.text_input[0].input("lagi")
+    at.button[0].click().run()
+    assert at.session_state.received == ['halo', 'lagi']
+
+
+def test_blank_submission_is_ignored():
+    at = AppTest.from_function(_app).run()
+    at.text_input[0].input("   ")
+    at.button[0].click().run()
+    assert at.session_state.received == []
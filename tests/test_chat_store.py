@@ -0,0 +1,273 @@
+import os
+import threading
+
+import pytest
+
+from chat_store import CsvChatLog, SqliteChatStore, WriteBehindStore, new_message
+
+
+@pytest.fixture(params=['csv', 'sqlite'])
+def store(request, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    if request.param == 'csv':
+        store = CsvChatLog(str(tmp_path / 'chat_history.csv'), fsync_policy='none')
+    else:
+        store = SqliteChatStore(str(tmp_path / 'chat_history.db'), fsync_policy='none')
+    yield store
+    store.close()
+
+
+def _messages(prefix, count):
+    return [new_message('User', f"{prefix}-{i}") for i in range(count)]
+
+
+# Fungsi untuk membaca semua halaman sebuah sesi dari yang terbaru sampai habis
+def _read_all_pages(store, session_id, limit):
+    items, cursor = store.read_page(session_id, limit)
+    pages = [items]
+    while cursor is not None:
+        items, cursor = store.read_page(session_id, limit, before=cursor)
+        pages.insert(0, items)
+    return [item['message'] for page in pages for item in page]
+
+
+def test_sessions_are_isolated_when_interleaved(store):
+    a, b = _messages('a', 10), _messages('b', 5)
+    for i in range(10):
+        store.append([a[i]], 'A')
+        if i < 5:
+            store.append([b[i]], 'B')
+
+    assert [item['message'] for item in store.read('A')] == [f"a-{i}" for i in range(10)]
+    assert [item['message'] for item in store.read('B')] == [f"b-{i}" for i in range(5)]
+    assert sum(len(chunk) for chunk in store.iter_messages('A')) == 10
+    assert _read_all_pages(store, 'A', 3) == [f"a-{i}" for i in range(10)]
+    assert _read_all_pages(store, 'B', 2) == [f"b-{i}" for i in range(5)]
+    assert len(store.read()) == 15
+
+    page, cursor = store.read_page('B', 50)
+    assert [item['message'] for item in page] == [f"b-{i}" for i in range(5)]
+    assert cursor is None
+
+
+def test_multiline_messages_page_correctly(store):
+    store.append([new_message('User', f"baris {i}\nlanjutan \"kutip\"") for i in range(6)], 'A')
+    store.append(_messages('b', 3), 'B')
+    messages = _read_all_pages(store, 'A', 4)
+    assert messages == [f"baris {i}\nlanjutan \"kutip\"" for i in range(6)]
+
+
+def _message_on(day, text):
+    return dict(new_message('User', text), timestamp=f"{day} 10:00:00")
+
+
+# Penggabungan batch write-behind tidak boleh mengubah urutan lintas sesi:
+# ekspor arsip membaca mundur dan berhenti di hari terakhir yang sudah diarsipkan
+def test_write_behind_preserves_enqueue_order(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = WriteBehindStore(CsvChatLog(str(tmp_path / 'chat_history.csv'), fsync_policy='none'), max_wait=0.2)
+    try:
+        store.append([_message_on('2026-10-10', 'A-day1')], 'A')
+        store.append([_message_on('2026-10-10', 'B-day1')], 'B')
+        store.append([_message_on('2026-10-11', 'A-day2')], 'A')
+        store.append([_message_on('2026-10-11', 'A-day2b')], 'A')
+        assert [item['message'] for item in store.read()] == ['A-day1', 'B-day1', 'A-day2', 'A-day2b']
+        assert store.batches == 1
+    finally:
+        store.close()
+
+
+def test_archive_keeps_every_closed_day(tmp_path, monkeypatch):
+    pq = pytest.importorskip('pyarrow.parquet')
+    from chat_archive import export_closed_days
+
+    monkeypatch.chdir(tmp_path)
+    archive = str(tmp_path / 'chat_archive')
+    store = WriteBehindStore(CsvChatLog(str(tmp_path / 'chat_history.csv'), fsync_policy='none'), max_wait=0.2)
+    try:
+        store.append([_message_on('2026-10-10', 'A-day1')], 'A')
+        store.append([_message_on('2026-10-10', 'B-day1')], 'B')
+        store.append([_message_on('2026-10-11', 'A-day2')], 'A')
+        assert export_closed_days(store, archive, today='2026-10-11') == ['2026-10-10']
+        store.append([_message_on('2026-10-12', 'C-day3')], 'C')
+        assert export_closed_days(store, archive, today='2026-10-13') == ['2026-10-11', '2026-10-12']
+        messages = sorted(pq.read_table(archive, columns=['message'])['message'].to_pylist())
+        assert messages == ['A-day1', 'A-day2', 'B-day1', 'C-day3']
+    finally:
+        store.close()
+
+
+@pytest.fixture
+def csv_log(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    log = CsvChatLog(str(tmp_path / 'chat_history.csv'), fsync_policy='none', max_bytes=0, max_age=0)
+    yield log
+    log.close()
+
+
+# Kursor "muat pesan sebelumnya" harus tetap berlaku setelah file aktif dirotasi
+def test_paging_across_rotation(csv_log):
+    csv_log.append(_messages('a', 10), 'A')
+    page, cursor = csv_log.read_page('A', 4)
+    assert [item['message'] for item in page] == ['a-6', 'a-7', 'a-8', 'a-9']
+
+    csv_log.max_bytes = 1
+    csv_log.append(_messages('late', 1), 'A')
+    assert csv_log.stats()['segments'] == 1
+
+    page, cursor = csv_log.read_page('A', 4, before=cursor)
+    assert [item['message'] for item in page] == ['a-2', 'a-3', 'a-4', 'a-5']
+    page, cursor = csv_log.read_page('A', 4, before=cursor)
+    assert [item['message'] for item in page] == ['a-0', 'a-1']
+    assert cursor is None
+
+
+# Reset sesi lain menulis ulang file; halaman berikutnya tidak boleh berisi pesan ganda
+def test_paging_after_other_session_reset(csv_log):
+    for i in range(8):
+        csv_log.append(_messages(f'a{i}', 1), 'A')
+        csv_log.append(_messages(f'b{i}', 3), 'B')
+    page, cursor = csv_log.read_page('A', 3)
+    seen = [item['message'] for item in page]
+
+    csv_log.reset('B')
+    while cursor is not None:
+        page, cursor = csv_log.read_page('A', 3, before=cursor)
+        seen = [item['message'] for item in page] + seen
+    assert seen == [f'a{i}-0' for i in range(8)]
+
+
+def test_paging_across_compressed_segments(csv_log):
+    csv_log.max_bytes = 1
+    for i in range(6):
+        csv_log.append(_messages(f'a{i}', 1), 'A')
+    csv_log.max_bytes = 0
+    csv_log.enforce_retention()
+    assert _read_all_pages(csv_log, 'A', 4) == [f'a{i}-0' for i in range(6)]
+
+
+# Dua instance pada file yang sama mewakili dua proses yang berbagi log CSV
+def test_shared_log_survives_other_process_reset(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / 'chat_history.csv')
+    first = CsvChatLog(path, fsync_policy='none')
+    second = CsvChatLog(path, fsync_policy='none')
+    try:
+        first.append(_messages('a', 2), 'A')
+        second.append(_messages('b', 2), 'B')
+        second.reset()
+        first.append(_messages('a2', 2), 'A')
+        second.append(_messages('b2', 1), 'B')
+        assert [item['message'] for item in second.read()] == ['a2-0', 'a2-1', 'b2-0']
+    finally:
+        first.close()
+        second.close()
+
+
+def test_shared_log_rotation_loses_no_appends(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / 'chat_history.csv')
+    logs = [CsvChatLog(path, fsync_policy='none', max_bytes=2000) for _ in range(2)]
+
+    def write(log, session_id):
+        for i in range(150):
+            log.append([new_message('User', f"{session_id}-{i}")], session_id)
+
+    threads = [threading.Thread(target=write, args=(log, session_id)) for log, session_id in zip(logs, 'AB')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    try:
+        assert logs[0].stats()['segments'] > 1
+        for session_id in 'AB':
+            assert [item['message'] for item in logs[1].read(session_id)] == [f"{session_id}-{i}" for i in range(150)]
+    finally:
+        for log in logs:
+            log.close()
+
+
+# Balasan bot dari domain.yml disimpan sebagai referensi template tanpa teks lengkapnya;
+# teks template dicatat di penyimpanan itu sendiri, jadi riwayat tetap utuh walaupun
+# tabel template global (response_templates.json) hilang
+def test_bot_reply_survives_lost_template_table(store, tmp_path, monkeypatch):
+    import chat_store
+    from response_templates import TemplateTable
+
+    (tmp_path / 'domain.yml').write_text("responses:\n  utter_halo:\n  - text: Halo {nama}, apa kabar?\n", encoding='utf-8')
+    monkeypatch.setattr(chat_store, 'template_table', TemplateTable(str(tmp_path / 'domain.yml'), str(tmp_path / 'templates.json')))
+    store.append([new_message('Bot', 'Halo Sedulur, apa kabar?'), new_message('Bot', 'Teks bebas')], 'A')
+    items = store.read('A')
+    assert items[0]['template'].startswith('utter_halo@')
+    assert [item['message'] for item in items] == ['Halo Sedulur, apa kabar?', 'Teks bebas']
+    store.close()
+    raw = b''.join(open(path, 'rb').read() for path in (store.path, f"{store.path}-wal") if os.path.exists(path))
+    assert b'Halo Sedulur, apa kabar?' not in raw
+    assert b'Teks bebas' in raw
+
+    monkeypatch.setattr(chat_store, 'template_table', TemplateTable(str(tmp_path / 'hilang.yml'), str(tmp_path / 'hilang.json')))
+    reopened = type(store)(store.path, fsync_policy='none')
+    try:
+        assert [item['message'] for item in reopened.read('A')] == ['Halo Sedulur, apa kabar?', 'Teks bebas']
+        assert [item['message'] for item in reopened.read_page('A')[0]] == ['Halo Sedulur, apa kabar?', 'Teks bebas']
+    finally:
+        reopened.close()
+
+
+# Sesi baru (atau sesi yang tidak ada di segmen) tidak membuka segmen mana pun
+def test_unknown_session_reads_no_segments(csv_log, tmp_path, monkeypatch):
+    for i in range(3):
+        csv_log.append(_messages(f'a{i}', 5), 'A')
+        csv_log._rotate_locked()
+    csv_log.append(_messages('b', 2), 'B')
+    csv_log.enforce_retention()
+    opened = []
+    open_segment = csv_log._open_segment
+    monkeypatch.setattr(csv_log, '_open_segment', lambda stem: opened.append(stem) or open_segment(stem))
+
+    assert csv_log.read_page('baru') == ([], None)
+    assert csv_log.read('baru') == []
+    assert [item['message'] for item in csv_log.read_page('B')[0]] == ['b-0', 'b-1']
+    assert opened == []
+    assert len(_read_all_pages(csv_log, 'A', 4)) == 15
+
+
+# Segmen dari versi lama tanpa indeks sesi diindeks sekali saat pertama dibaca
+def test_segment_index_is_rebuilt_when_missing(csv_log, tmp_path):
+    csv_log.append(_messages('a', 3), 'A')
+    csv_log._rotate_locked()
+    for path in tmp_path.glob('*.sessions.json'):
+        path.unlink()
+
+    log = CsvChatLog(csv_log.path, fsync_policy='none')
+    try:
+        assert [item['message'] for item in log.read('A')] == ['a-0', 'a-1', 'a-2']
+        assert log.read('B') == []
+        assert len(list(tmp_path.glob('*.sessions.json'))) == 1
+    finally:
+        log.close()
+
+
+# Reset satu sesi hanya menulis ulang segmen yang memuat sesi tersebut
+def test_reset_touches_only_segments_of_the_session(csv_log, monkeypatch):
+    import chat_store
+
+    csv_log.append(_messages('a', 2), 'A')
+    csv_log._rotate_locked()
+    csv_log.append(_messages('b', 2), 'B')
+    csv_log._rotate_locked()
+    csv_log.append(_messages('c', 2), 'C')
+    csv_log.enforce_retention()
+    rewritten = []
+    remove_rows = chat_store._remove_session_rows
+    monkeypatch.setattr(chat_store, '_remove_session_rows', lambda path, session_id: rewritten.append(path) or remove_rows(path, session_id))
+
+    first_segment = csv_log._segment_stems()[0]
+    csv_log.reset('A')
+    assert {path.split('.csv')[0] for path in rewritten} == {first_segment}
+    assert csv_log.read('A') == []
+    rewritten.clear()
+    csv_log.reset('A')
+    csv_log.reset('baru')
+    assert rewritten == []
+    assert [item['message'] for item in csv_log.read()] == ['b-0', 'b-1', 'c-0', 'c-1']
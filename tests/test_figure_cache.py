@@ -0,0 +1,69 @@
+from figure_cache import FigureCache, data_fingerprint
+
+
+# Figure palsu: seperti plotly (to_json) atau matplotlib (savefig)
+class FakePlotlyFigure:
+    def __init__(self, size):
+        self.size = size
+
+    def to_json(self):
+        return 'x' * self.size
+
+
+class FakeMatplotlibFigure:
+    def savefig(self, buffer, **kwargs):
+        buffer.write(b'png')
+
+
+def test_fingerprint_ignores_key_order():
+    assert data_fingerprint({'a': 1, 'b': 2}) == data_fingerprint({'b': 2, 'a': 1})
+    assert data_fingerprint({'a': 1}) != data_fingerprint({'a': 2})
+
+
+def test_rebuilds_only_when_data_or_params_change():
+    cache = FigureCache()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return FakePlotlyFigure(10)
+
+    kind, figure = cache.get('usage', {'Positif': 3}, build, granularity='day')
+    assert kind == 'plotly' and isinstance(figure, FakePlotlyFigure)
+    assert cache.get('usage', {'Positif': 3}, build, granularity='day')[1] is figure
+    cache.get('usage', {'Positif': 4}, build, granularity='day')
+    cache.get('usage', {'Positif': 4}, build, granularity='week')
+    cache.get('topics', {'Positif': 4}, build, granularity='week')
+    assert len(builds) == 4
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['hit_rate']) == (1, 4, 0.2)
+
+
+def test_matplotlib_figures_are_cached_as_png():
+    cache = FigureCache()
+    assert cache.get('gauge', 70, FakeMatplotlibFigure) == ('png', b'png')
+    assert cache.stats()['bytes'] == 3
+
+
+# Ukuran cache dihitung dari byte spesifikasi; entri terlama dibuang lebih dulu
+def test_evicts_least_recently_used_by_bytes():
+    cache = FigureCache(max_bytes=250)
+    cache.get('a', 1, lambda: FakePlotlyFigure(100))
+    cache.get('b', 1, lambda: FakePlotlyFigure(100))
+    cache.get('a', 1, lambda: FakePlotlyFigure(100))
+    cache.get('c', 1, lambda: FakePlotlyFigure(100))
+    stats = cache.stats()
+    assert (stats['entries'], stats['bytes'], stats['evictions']) == (2, 200, 1)
+
+    builds = []
+    cache.get('a', 1, lambda: builds.append('a') or FakePlotlyFigure(100))
+    cache.get('b', 1, lambda: builds.append('b') or FakePlotlyFigure(100))
+    assert builds == ['b']
+
+
+def test_oversized_figure_is_not_cached():
+    cache = FigureCache(max_bytes=50)
+    cache.get('a', 1, lambda: FakePlotlyFigure(10))
+    assert cache.get('big', 1, lambda: FakePlotlyFigure(100))[0] == 'plotly'
+    stats = cache.stats()
+    assert (stats['entries'], stats['bytes'], stats['evictions']) == (1, 10, 0)
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from inference_pool import InferenceBusyError, InferencePool
+
+
+# Coroutine dengan bagian sinkron yang lama, seperti prediksi policy TensorFlow
+def _blocking(seconds, threads=None):
+    async def run():
+        if threads is not None:
+            threads.add(threading.get_ident())
+        time.sleep(seconds)
+        return seconds
+    return run
+
+
+def test_blocking_calls_run_in_parallel():
+    pool = InferencePool(max_concurrency=2, max_queue=0, max_workers=2)
+    threads = set()
+
+    async def run():
+        started = time.monotonic()
+        results = await asyncio.gather(*(pool.run(_blocking(0.2, threads), 5) for _ in range(2)))
+        return time.monotonic() - started, results
+
+    try:
+        elapsed, results = asyncio.run(run())
+    finally:
+        pool.close()
+    assert results == [0.2, 0.2]
+    assert elapsed < 0.35
+    assert len(threads) == 2 and threading.get_ident() not in threads
+
+
+# Tenggat tetap berlaku walaupun worker tertahan, dan slot baru dilepas saat worker selesai
+def test_deadline_fires_while_worker_is_blocked():
+    pool = InferencePool(max_concurrency=1, max_queue=0, max_workers=1)
+
+    async def run():
+        started = time.monotonic()
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.run(_blocking(0.4), 0.1)
+        elapsed = time.monotonic() - started
+        with pytest.raises(InferenceBusyError):
+            await pool.run(_blocking(0), 1)
+        await asyncio.sleep(0.4)
+        return elapsed, pool.stats(), await pool.run(_blocking(0), 1)
+
+    try:
+        elapsed, stats, result = asyncio.run(run())
+    finally:
+        pool.close()
+    assert elapsed < 0.3
+    assert stats['active'] == 0
+    assert stats['timed_out'] == 1 and stats['rejected'] == 1
+    assert result == 0
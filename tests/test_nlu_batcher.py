@@ -0,0 +1,63 @@
+import asyncio
+import glob
+import os
+
+import pytest
+
+pytest.importorskip("rasa.core.agent")
+
+from rasa.core.agent import Agent  # noqa: E402
+from rasa.shared.core.trackers import DialogueStateTracker  # noqa: E402
+from rasa.core.channels.channel import UserMessage  # noqa: E402
+
+from conftest import ROOT  # noqa: E402
+from nlu_batcher import NLUBatcher  # noqa: E402
+
+TEXTS = [
+    "halo",
+    "aku merasa cemas akhir-akhir ini",
+    "susah tidur terus",
+    "terima kasih ya",
+]
+
+
+@pytest.fixture(scope="module")
+def agent():
+    models = sorted(glob.glob(os.path.join(ROOT, "models", "*.tar.gz")), key=os.path.getmtime)
+    if not models:
+        pytest.skip("belum ada model terlatih di ./models")
+    return Agent.load(models[-1])
+
+
+# Hasil batch harus sama dengan MessageProcessor.parse_message, termasuk nama
+# lengkap intent retrieval ResponseSelector
+def test_batched_parse_matches_processor(agent):
+    processor = agent.processor
+
+    async def run():
+        batcher = NLUBatcher(processor, max_batch_size=len(TEXTS), max_wait=0.05)
+        messages = [UserMessage(text, sender_id="test") for text in TEXTS]
+        batched = await asyncio.gather(*(batcher.parse(message) for message in messages))
+        single = [await processor.parse_message(message) for message in messages]
+        return batched, single, batcher
+
+    batched, single, batcher = asyncio.run(run())
+    assert batcher.batches == 1
+    for got, expected in zip(batched, single):
+        assert got["intent"]["name"] == expected["intent"]["name"]
+        assert got["intent"]["confidence"] == pytest.approx(expected["intent"]["confidence"], abs=1e-5)
+        assert got.get("response_selector", {}).keys() == expected.get("response_selector", {}).keys()
+        assert got["entities"] == expected["entities"]
+
+
+def test_single_message_keeps_tracker(agent):
+    processor = agent.processor
+    tracker = DialogueStateTracker("test", slots=[])
+
+    async def run():
+        batcher = NLUBatcher(processor, max_batch_size=1)
+        message = UserMessage(TEXTS[1], sender_id="test")
+        return await batcher.parse(message, tracker), await processor.parse_message(message, tracker)
+
+    batched, single = asyncio.run(run())
+    assert batched["intent"]["name"] == single["intent"]["name"]
@@ -0,0 +1,119 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import parse_cache
+from parse_cache import ParseCache, install_parse_cache
+
+GREET = {'text': 'halo', 'intent': {'name': 'greet', 'confidence': 0.9}, 'entities': []}
+MOOD = {
+    'text': 'aku sedih',
+    'intent': {'name': 'mood', 'confidence': 0.8},
+    'entities': [{'entity': 'emosi', 'value': 'sedih', 'start': 4, 'end': 9}],
+}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(parse_cache.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def _cache(**kwargs):
+    cache = ParseCache(**kwargs)
+    cache.set_fingerprint('model-1')
+    return cache
+
+
+def test_hit_normalizes_text_and_returns_copy():
+    cache = _cache()
+    cache.put('halo', GREET)
+    result = cache.get('  HALO ')
+    assert result['intent'] == GREET['intent']
+    assert result['text'] == '  HALO '
+    result['intent']['name'] = 'diubah'
+    assert cache.get('halo')['intent']['name'] == 'greet'
+
+
+def test_ttl_expiry(clock):
+    cache = _cache(ttl=60)
+    cache.put('halo', GREET)
+    clock[0] += 59
+    assert cache.get('halo') is not None
+    clock[0] += 2
+    assert cache.get('halo') is None
+    stats = cache.stats()
+    assert (stats['entries'], stats['evictions']) == (0, 1)
+
+
+def test_lru_eviction_by_size():
+    cache = _cache(max_size=2)
+    cache.put('a', GREET)
+    cache.put('b', GREET)
+    cache.get('a')
+    cache.put('c', GREET)
+    assert cache.peek('b') is None
+    assert cache.peek('a') is not None and cache.peek('c') is not None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_fingerprint_change_invalidates():
+    cache = _cache()
+    cache.put('halo', GREET)
+    cache.set_fingerprint('model-1')
+    assert cache.peek('halo') is not None
+    cache.set_fingerprint('model-2')
+    assert cache.get('halo') is None
+    # Agent lama (fingerprint berbeda) tidak boleh membaca atau mengisi cache model baru
+    cache.put('halo', GREET, fingerprint='model-1')
+    assert cache.peek('halo') is None
+    cache.put('halo', GREET, fingerprint='model-2')
+    assert cache.get('halo', fingerprint='model-1') is None
+    assert cache.get('halo', fingerprint='model-2') is not None
+    assert cache.stats()['invalidations'] == 2
+
+
+# Posisi entitas mengacu pada teks asli, jadi teks yang hanya sama setelah dinormalkan tidak memakai cache
+def test_entities_skip_cache_when_offsets_differ():
+    cache = _cache()
+    cache.put('aku sedih', MOOD)
+    assert cache.get('aku sedih')['entities'] == MOOD['entities']
+    assert cache.get('  Aku  sedih') is None
+    assert cache.peek('aku sedih') is not None
+
+
+def test_hit_rate_stats():
+    cache = _cache()
+    assert cache.stats()['hit_rate'] == 0.0
+    cache.get('halo')
+    cache.put('halo', GREET)
+    cache.get('halo')
+    cache.get('Halo')
+    cache.get('apa kabar')
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['hit_rate']) == (2, 2, 0.5)
+    assert stats['fingerprint'] == 'model-1'
+
+
+def test_install_parse_cache_skips_intents_and_full_output():
+    calls = []
+
+    async def parse_message(message, tracker=None, only_output_properties=True):
+        calls.append(message.text)
+        return dict(GREET, text=message.text)
+
+    processor = SimpleNamespace(parse_message=parse_message, model_metadata=SimpleNamespace(model_id='model-1'))
+    agent = SimpleNamespace(processor=processor)
+    cache = install_parse_cache(agent, ParseCache())
+
+    async def run():
+        for text in ['halo', 'Halo', '/greet', '/greet']:
+            await processor.parse_message(SimpleNamespace(text=text))
+        await processor.parse_message(SimpleNamespace(text='halo'), None, False)
+
+    asyncio.run(run())
+    assert calls == ['halo', '/greet', '/greet', 'halo']
+    assert processor.parse_cache is cache
+    assert cache.fingerprint == 'model-1'
@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+import pytest
+
+import rasa_client
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = rasa_client.agent_registry
+    # Model tidak benar-benar dimuat; status diatur langsung oleh tes
+    monkeypatch.setattr(registry, 'start', lambda: None)
+    monkeypatch.setattr(registry, 'status', 'loading')
+    monkeypatch.setattr(registry, '_agent', None)
+    monkeypatch.setattr(rasa_client, 'RESPONSE_TIMEOUT', 0.3)
+    monkeypatch.setattr(rasa_client, 'inference_pool', rasa_client.InferencePool(2, 4, 2))
+    return registry
+
+
+# Saat model masih dimuat, permintaan dibatasi antrean dan tenggat inferensi
+def test_cold_start_is_bounded_by_pool(registry):
+    async def run():
+        started = time.monotonic()
+        replies = await asyncio.gather(*(rasa_client.get_local_response("halo") for _ in range(20)))
+        return time.monotonic() - started, replies
+
+    elapsed, replies = asyncio.run(run())
+    stats = rasa_client.inference_pool.stats()
+    assert elapsed < 2
+    assert stats['rejected'] == 14
+    assert stats['timed_out'] == 6
+    assert len(set(replies)) == 1
+
+
+def test_reply_once_agent_ready(registry):
+    class Agent:
+        async def handle_text(self, text, sender_id=None):
+            return [{'text': f"balasan untuk {text}"}]
+
+    async def run():
+        task = asyncio.ensure_future(rasa_client.get_local_response("halo"))
+        await asyncio.sleep(0.05)
+        registry._agent, registry.status = Agent(), 'ready'
+        return await task
+
+    assert asyncio.run(run()) == "balasan untuk halo"
+
+
+def test_failed_load_is_unavailable(registry):
+    registry.status = 'failed'
+    reply = asyncio.run(rasa_client.get_local_response("halo"))
+    assert reply.startswith("Maaf")
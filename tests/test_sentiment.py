@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+
+from sentiment import SentimentLexicon, analyze_sentiment, classify, score_messages, sentiment_counts
+
+BASELINE_POSITIVE = ['bahagia', 'senang', 'gembira', 'positif', 'baik']
+BASELINE_NEGATIVE = ['sedih', 'marah', 'kecewa', 'negatif', 'buruk']
+
+
+# Penilaian awal aplikasi: kata dipisah spasi, kata berbeda dihitung sekali
+def _baseline(text):
+    words = set(text.lower().split())
+    score = len(words & set(BASELINE_POSITIVE)) - len(words & set(BASELINE_NEGATIVE))
+    return 'Positif' if score > 0 else 'Negatif' if score < 0 else 'Netral'
+
+
+def test_matches_baseline_on_plain_words():
+    lexicon = SentimentLexicon(BASELINE_POSITIVE, BASELINE_NEGATIVE)
+    texts = [
+        'aku senang sekali', 'sedih dan marah', 'senang tapi sedih', 'SENANG senang senang',
+        'hari ini biasa saja', 'baik baik saja tapi kecewa buruk', '', 'bahagia gembira sedih',
+    ]
+    labels = classify(score_messages(texts, lexicon))
+    assert list(labels) == [_baseline(text) for text in texts]
+
+
+@pytest.mark.parametrize('text, label', [
+    ('senang!', 'Positif'),
+    ('Aku sedih...', 'Negatif'),
+    ('terima kasih ya', 'Positif'),
+    ('rasanya putus   asa', 'Negatif'),
+    ('kesenangan', 'Netral'),
+    ('senang, senang, tapi cemas', 'Netral'),
+    ('', 'Netral'),
+])
+def test_analyze_sentiment_with_lexicon(text, label):
+    assert analyze_sentiment(text) == label
+
+
+def test_scores_count_distinct_terms_and_phrases():
+    scores = score_messages(['senang senang bahagia', 'terima kasih, aku lega', 'sedih', None])
+    assert list(scores) == [2, 2, -1, 0]
+    assert scores.dtype == 'int64'
+
+
+def test_classify_keeps_index():
+    labels = classify(pd.Series([3, 0, -2], index=[5, 6, 7]))
+    assert labels.to_dict() == {5: 'Positif', 6: 'Netral', 7: 'Negatif'}
+
+
+def test_sentiment_counts_only_user_messages():
+    history = [
+        {'role': 'User', 'message': 'senang!'},
+        {'role': 'Bot', 'message': 'sedih'},
+        {'role': 'User', 'message': 'sedih'},
+        {'role': 'User', 'message': 'bahagia'},
+    ]
+    assert sentiment_counts(history).to_dict() == {'Positif': 2, 'Negatif': 1}
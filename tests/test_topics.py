@@ -0,0 +1,70 @@
+import random
+
+import pytest
+import yaml
+
+from topics import DEFAULT_TOPIC, TOPIC_TAXONOMY_PATH, KeywordAutomaton, TopicMatcher, load_topic_matcher
+
+BASELINE_TOPICS = {
+    'Kecemasan': ['cemas', 'khawatir', 'takut'],
+    'Depresi': ['sedih', 'depresi', 'putus asa'],
+    'Stres': ['stres', 'tertekan', 'overwhelmed'],
+    'Tidur': ['tidur', 'insomnia', 'lelah'],
+    'Relasi': ['hubungan', 'teman', 'keluarga'],
+}
+
+
+# Pencarian naif sebagai pembanding: setiap kata kunci dicari sebagai potongan teks
+def _naive_find(keywords, text):
+    return {label for keyword, labels in keywords.items() if keyword in text for label in labels}
+
+
+# Penentuan topik awal aplikasi: topik pertama yang salah satu kata kuncinya muncul
+def _baseline_topic(message):
+    for topic, keywords in BASELINE_TOPICS.items():
+        if any(keyword in message.lower() for keyword in keywords):
+            return topic
+    return DEFAULT_TOPIC
+
+
+def test_automaton_matches_naive_search():
+    rng = random.Random(0)
+    for _ in range(50):
+        # Alfabet kecil agar kata kunci sering tumpang tindih dan saling menjadi akhiran
+        keywords = {}
+        for index in range(rng.randint(1, 12)):
+            keyword = ''.join(rng.choice('abc') for _ in range(rng.randint(1, 5)))
+            keywords.setdefault(keyword, set()).add(f"label{index % 4}")
+        automaton = KeywordAutomaton(keywords)
+        for _ in range(20):
+            text = ''.join(rng.choice('abcd') for _ in range(rng.randint(0, 30)))
+            assert automaton.find(text) == _naive_find(keywords, text), (keywords, text)
+
+
+def test_automaton_overlapping_keywords():
+    automaton = KeywordAutomaton({'he': {'A'}, 'she': {'B'}, 'his': {'C'}, 'hers': {'D'}})
+    assert automaton.find('ushers') == {'A', 'B', 'D'}
+    assert automaton.find('') == set()
+    assert KeywordAutomaton({}).find('apa saja') == set()
+
+
+@pytest.mark.parametrize('message', [
+    'Aku cemas dan sedih', 'susah TIDUR karena stres', 'rasanya putus asa', 'putus  asa',
+    'kecemasan', 'hubungan dengan teman', 'hari ini biasa', '', 'overwhelmed, lelah, takut',
+])
+def test_primary_matches_baseline(message):
+    assert load_topic_matcher().primary(message) == _baseline_topic(message)
+
+
+def test_shipped_taxonomy_is_baseline():
+    with open(TOPIC_TAXONOMY_PATH, encoding='utf-8') as f:
+        assert yaml.safe_load(f) == BASELINE_TOPICS
+
+
+def test_multi_label_counts():
+    matcher = TopicMatcher(BASELINE_TOPICS)
+    messages = ['cemas dan lelah', 'teman', 'halo']
+    assert matcher.match('lelah, cemas') == ['Kecemasan', 'Tidur']
+    assert matcher.classify_batch(messages, multi_label=True) == [['Kecemasan', 'Tidur'], ['Relasi'], [DEFAULT_TOPIC]]
+    assert matcher.counts(messages) == {'Kecemasan': 1, 'Relasi': 1, DEFAULT_TOPIC: 1}
+    assert matcher.counts(messages, multi_label=True)['Tidur'] == 1
@@ -0,0 +1,63 @@
+import pytest
+
+import tracker_store
+from tracker_store import EvictingTrackerDict, unwrap_tracker_store
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(tracker_store.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_lru_eviction_keeps_recently_used(clock):
+    store = EvictingTrackerDict(2, lambda: 0)
+    store['a'] = b'aaaa'
+    store['b'] = b'bb'
+    assert store['a'] == b'aaaa'
+    store['c'] = b'c'
+    assert 'b' not in store
+    assert list(store) == ['a', 'c']
+    assert store.stats()['lru_evictions'] == 1
+    assert store.total_bytes == 5
+
+
+def test_ttl_eviction(clock):
+    store = EvictingTrackerDict(10, lambda: 60)
+    store['a'] = b'aaa'
+    clock[0] += 30
+    store['b'] = b'b'
+    clock[0] += 31
+    with pytest.raises(KeyError):
+        store['a']
+    assert store['b'] == b'b'
+    clock[0] += 61
+    assert store.evict_expired() == 1
+    stats = store.stats()
+    assert stats['ttl_evictions'] == 2
+    assert stats['trackers'] == 0
+    assert stats['bytes'] == 0
+
+
+def test_byte_count_follows_overwrite_and_delete(clock):
+    store = EvictingTrackerDict(10, lambda: 0)
+    store['a'] = b'12345'
+    store['a'] = b'12'
+    store['b'] = b'123'
+    assert store.total_bytes == 5
+    del store['a']
+    assert store.total_bytes == 3
+    assert store.pop('b') == b'123'
+    assert store.total_bytes == 0
+
+
+class _Wrapper:
+    def __init__(self, tracker_store):
+        self._tracker_store = tracker_store
+
+
+def test_unwrap_tracker_store():
+    inner = object()
+    assert unwrap_tracker_store(_Wrapper(_Wrapper(inner))) is inner
+    assert unwrap_tracker_store(inner) is inner
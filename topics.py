@@ -0,0 +1,138 @@
+import argparse
+import random
+import string
+import threading
+import time
+from collections import Counter, deque
+
+import yaml
+
+TOPIC_TAXONOMY_PATH = 'lexicons/topics.yml'
+DEFAULT_TOPIC = 'Lainnya'
+
+
+# Automaton Aho-Corasick: semua kata kunci dicari dalam satu kali lintasan teks,
+# sehingga biayanya sebanding dengan panjang teks dan tidak bergantung pada jumlah kata kunci
+class KeywordAutomaton:
+    def __init__(self, keywords):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [frozenset()]
+        outputs = [set()]
+        for keyword, labels in keywords.items():
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    outputs.append(set())
+                state = next_state
+            outputs[state].update(labels)
+        # Tautan gagal dibangun secara BFS; output state mewarisi output tautan gagalnya
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                outputs[next_state] |= outputs[self._fail[next_state]]
+        self._output = [frozenset(labels) for labels in outputs]
+
+    # Fungsi untuk mendapatkan semua label yang kata kuncinya muncul di teks
+    def find(self, text):
+        goto, fail, output = self._goto, self._fail, self._output
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found |= output[state]
+        return found
+
+
+# Pengklasifikasi topik berdasarkan taksonomi {topik: [kata kunci]}
+class TopicMatcher:
+    def __init__(self, taxonomy):
+        self.topics = list(taxonomy)
+        keywords = {}
+        for topic, terms in taxonomy.items():
+            for term in terms or []:
+                term = str(term).strip().lower()
+                if term:
+                    keywords.setdefault(term, set()).add(topic)
+        self._automaton = KeywordAutomaton(keywords)
+        self._order = {topic: index for index, topic in enumerate(self.topics)}
+
+    # Fungsi untuk mendapatkan semua topik sebuah pesan, urut sesuai taksonomi
+    def match(self, message):
+        found = self._automaton.find((message or '').lower())
+        return sorted(found, key=self._order.__getitem__)
+
+    # Fungsi untuk mendapatkan topik utama (topik pertama di taksonomi) atau DEFAULT_TOPIC
+    def primary(self, message):
+        topics = self.match(message)
+        return topics[0] if topics else DEFAULT_TOPIC
+
+    # Fungsi untuk mengklasifikasi banyak pesan sekaligus
+    def classify_batch(self, messages, multi_label=False):
+        if multi_label:
+            return [self.match(message) or [DEFAULT_TOPIC] for message in messages]
+        return [self.primary(message) for message in messages]
+
+    # Fungsi untuk menghitung frekuensi topik dari banyak pesan
+    def counts(self, messages, multi_label=False):
+        if multi_label:
+            return Counter(topic for topics in self.classify_batch(messages, True) for topic in topics)
+        return Counter(self.classify_batch(messages))
+
+
+_matchers = {}
+_matchers_lock = threading.Lock()
+
+
+# Fungsi untuk memuat taksonomi dari file YAML (sekali per proses untuk setiap path)
+def load_topic_matcher(path=TOPIC_TAXONOMY_PATH):
+    with _matchers_lock:
+        matcher = _matchers.get(path)
+        if matcher is None:
+            with open(path, encoding='utf-8') as f:
+                matcher = TopicMatcher(yaml.safe_load(f) or {})
+            _matchers[path] = matcher
+        return matcher
+
+
+# Benchmark: waktu per karakter harus tetap datar saat jumlah kata kunci bertambah
+def _benchmark(keyword_counts, text_lengths, repeat):
+    rng = random.Random(0)
+    alphabet = string.ascii_lowercase + ' '
+    print(f"{'kata kunci':>10} {'panjang teks':>12} {'ms/pesan':>10} {'ns/karakter':>12}")
+    for keyword_count in keyword_counts:
+        taxonomy = {f"topik{i % 50}": [] for i in range(min(keyword_count, 50))}
+        for i in range(keyword_count):
+            word = ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10)))
+            taxonomy[f"topik{i % 50}"].append(word)
+        matcher = TopicMatcher(taxonomy)
+        for length in text_lengths:
+            text = ''.join(rng.choice(alphabet) for _ in range(length))
+            started = time.perf_counter()
+            for _ in range(repeat):
+                matcher.match(text)
+            elapsed = (time.perf_counter() - started) / repeat
+            print(f"{keyword_count:>10} {length:>12} {elapsed * 1e3:>10.3f} {elapsed / length * 1e9:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark pencocok topik Aho-Corasick")
+    parser.add_argument("--keywords", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--lengths", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    _benchmark(args.keywords, args.lengths, args.repeat)
@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+try:
+    from rasa.core.tracker_store import InMemoryTrackerStore
+except ImportError:
+    # EvictingTrackerDict tetap bisa dipakai tanpa Rasa; tracker store di bawah membutuhkan Rasa
+    InMemoryTrackerStore = None
+
+
+# Penyimpanan tracker terserialisasi dengan batas jumlah (LRU) dan umur (TTL).
+# InMemoryTrackerStore hanya memakai operasi dict biasa pada atribut `store`,
+# sehingga mengganti dict tersebut cukup untuk membatasi memori.
+class EvictingTrackerDict(MutableMapping):
+    def __init__(self, max_size, ttl_getter):
+        self.max_size = max_size
+        self._ttl_getter = ttl_getter
+        self._data = OrderedDict()
+        self._touched = {}
+        self._lock = threading.RLock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lru_evictions = 0
+        self.ttl_evictions = 0
+
+    def _is_expired(self, key, now):
+        ttl = self._ttl_getter()
+        return bool(ttl) and now - self._touched[key] > ttl
+
+    def _remove(self, key):
+        value = self._data.pop(key)
+        del self._touched[key]
+        self.total_bytes -= len(value)
+
+    def __getitem__(self, key):
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                raise KeyError(key)
+            now = time.monotonic()
+            if self._is_expired(key, now):
+                self._remove(key)
+                self.ttl_evictions += 1
+                self.misses += 1
+                raise KeyError(key)
+            self._data.move_to_end(key)
+            self._touched[key] = now
+            self.hits += 1
+            return self._data[key]
+
+    def __contains__(self, key):
+        with self._lock:
+            if key in self._data:
+                if not self._is_expired(key, time.monotonic()):
+                    return True
+                self._remove(key)
+                self.ttl_evictions += 1
+            self.misses += 1
+            return False
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = value
+            self._touched[key] = time.monotonic()
+            self.total_bytes += len(value)
+            self.evict_expired()
+            while len(self._data) > self.max_size:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.lru_evictions += 1
+
+    def __delitem__(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._data))
+
+    def __len__(self):
+        return len(self._data)
+
+    # Fungsi untuk membuang tracker yang sudah kedaluwarsa (yang paling lama ada di depan)
+    def evict_expired(self):
+        with self._lock:
+            now = time.monotonic()
+            evicted = 0
+            while self._data:
+                oldest = next(iter(self._data))
+                if not self._is_expired(oldest, now):
+                    break
+                self._remove(oldest)
+                evicted += 1
+            self.ttl_evictions += evicted
+            return evicted
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'trackers': len(self._data),
+                'max_size': self.max_size,
+                'bytes': self.total_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'lru_evictions': self.lru_evictions,
+                'ttl_evictions': self.ttl_evictions,
+            }
+
+
+# Fungsi untuk mendapatkan tracker store asli di balik pembungkus Rasa.
+# Agent Rasa 3.x membungkus tracker store yang diberikan dengan FailSafeTrackerStore,
+# jadi `agent.tracker_store` tidak punya atribut `store` maupun `stats()`.
+def unwrap_tracker_store(tracker_store):
+    while hasattr(tracker_store, '_tracker_store'):
+        tracker_store = tracker_store._tracker_store
+    return tracker_store
+
+
+if InMemoryTrackerStore is not None:
+    # Tracker store in-memory yang membatasi jumlah percakapan aktif.
+    # TTL mengikuti session_expiration_time pada domain.yml (dalam menit); tracker
+    # yang lebih lama tidak aktif dihapus karena Rasa akan memulai sesi baru.
+    class BoundedInMemoryTrackerStore(InMemoryTrackerStore):
+        def __init__(self, domain=None, event_broker=None, max_size=5000, **kwargs):
+            super().__init__(domain, event_broker=event_broker, **kwargs)
+            self.store = EvictingTrackerDict(max_size, self._ttl_seconds)
+
+        def _ttl_seconds(self):
+            session_config = getattr(self.domain, 'session_config', None)
+            minutes = getattr(session_config, 'session_expiration_time', 0) if session_config else 0
+            return (minutes or 0) * 60
+
+        def stats(self):
+            return self.store.stats()
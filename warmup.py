@@ -0,0 +1,102 @@
+import asyncio
+import re
+import statistics
+import time
+import uuid
+
+from tracker_store import unwrap_tracker_store
+
+NLU_DATA_PATH = "data/nlu.yml"
+STORIES_DATA_PATH = "data/stories.yml"
+WARMUP_SENDER_PREFIX = "__warmup__"
+
+_ENTITY_ANNOTATION = re.compile(r"\[([^\]]+)\](\([^)]*\)|\{[^}]*\})")
+
+
+def _read_yaml(path):
+    import yaml
+    with open(path, encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+# Fungsi untuk mengambil contoh kalimat per intent dari data/nlu.yml
+def load_intent_examples(path=NLU_DATA_PATH, per_intent=2):
+    examples = {}
+    for item in _read_yaml(path).get("nlu", []):
+        if "intent" not in item:
+            continue
+        texts = []
+        for line in (item.get("examples") or "").splitlines():
+            line = line.strip()
+            if line.startswith("- "):
+                texts.append(_ENTITY_ANNOTATION.sub(r"\1", line[2:]).strip())
+        examples[item["intent"]] = texts[:per_intent]
+    return examples
+
+
+# Fungsi untuk menyusun alur percakapan dari data/stories.yml memakai contoh tiap intent
+def load_story_paths(examples, path=STORIES_DATA_PATH):
+    paths = []
+    for story in _read_yaml(path).get("stories", []):
+        texts = [examples[step["intent"]][0] for step in story.get("steps", []) if examples.get(step.get("intent"))]
+        if texts:
+            paths.append(texts)
+    return paths
+
+
+def _forget_sender(agent, sender_id):
+    store = getattr(unwrap_tracker_store(agent.tracker_store), "store", None)
+    if store is not None:
+        store.pop(sender_id, None)
+
+
+async def _replay(agent, conversations):
+    latencies = []
+    for texts in conversations:
+        sender_id = f"{WARMUP_SENDER_PREFIX}{uuid.uuid4().hex}"
+        try:
+            for text in texts:
+                started = time.perf_counter()
+                await agent.handle_text(text, sender_id=sender_id)
+                latencies.append(time.perf_counter() - started)
+        finally:
+            _forget_sender(agent, sender_id)
+    return latencies
+
+
+# Fungsi untuk memanaskan agent: graph DIET, ResponseSelector dan TED ditelusuri
+# sebelum pengguna pertama datang. Putaran pertama dicatat sebagai latensi dingin,
+# putaran kedua (contoh yang sama) sebagai latensi hangat.
+async def warm_up(agent, per_intent=2):
+    examples = load_intent_examples(per_intent=per_intent)
+    conversations = [[text] for texts in examples.values() for text in texts]
+    conversations += load_story_paths(examples)
+    if not conversations:
+        return {}
+    cold = await _replay(agent, conversations)
+    warm = await _replay(agent, conversations)
+    return {
+        'intents': len(examples),
+        'messages': len(cold),
+        'first_ms': cold[0] * 1000,
+        'cold_mean_ms': statistics.mean(cold) * 1000,
+        'warm_mean_ms': statistics.mean(warm) * 1000,
+        'warm_max_ms': max(warm) * 1000,
+    }
+
+
+# Fungsi untuk menjalankan warm-up secara sinkron (dipakai sebagai load hook registry)
+def run_warm_up(agent, per_intent=2):
+    try:
+        report = asyncio.run(warm_up(agent, per_intent))
+    except Exception as e:
+        print(f"Warm-up model Rasa gagal: {e}")
+        report = {'error': repr(e)}
+    else:
+        if report:
+            print(
+                f"Warm-up selesai: {report['messages']} pesan, pertama {report['first_ms']:.0f} ms, "
+                f"dingin {report['cold_mean_ms']:.0f} ms, hangat {report['warm_mean_ms']:.0f} ms"
+            )
+    agent.warmup_report = report
+    return report